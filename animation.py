@@ -0,0 +1,98 @@
+from collections import deque
+
+import chess
+
+MAX_FRAME_STEP = 50  # Максимальный шаг анимации за кадр (мс), чтобы после паузы фигуры не прыгали
+
+
+def ease_out_cubic(progress):
+    """Плавное замедление в конце движения"""
+    return 1 - (1 - progress) ** 3
+
+
+class MoveAnimation:
+    """Анимация одного хода: несколько фигур движутся одновременно
+
+    Хранит позицию до хода без движущихся фигур (static) и список перемещений
+    (tweens) вида (символ фигуры, откуда, куда). Взятая фигура остается в static
+    и исчезает, когда ход доигран; при рокировке вместе с королем едет ладья,
+    при превращении до конца движения рисуется пешка.
+    """
+    def __init__(self, board, move):
+        piece = board.piece_at(move.from_square)
+        self.move = move
+        self.tweens = []
+        if piece is not None:
+            if board.is_castling(move):
+                rank = chess.square_rank(move.from_square)
+                kingside = board.is_kingside_castling(move)
+                king_to = chess.square(6 if kingside else 2, rank)
+                rook_from = chess.square(7 if kingside else 0, rank)
+                rook_to = chess.square(5 if kingside else 3, rank)
+                rook = board.piece_at(rook_from)
+                self.tweens.append((piece.symbol(), move.from_square, king_to))
+                if rook is not None:
+                    self.tweens.append((rook.symbol(), rook_from, rook_to))
+            else:
+                self.tweens.append((piece.symbol(), move.from_square, move.to_square))
+
+        moving = {from_square for _, from_square, _ in self.tweens}
+        self.static = {square: p.symbol() for square, p in board.piece_map().items() if square not in moving}
+        # Клетки, которые меняются за время анимации (для перерисовки)
+        self.squares = {move.from_square, move.to_square}
+        for _, from_square, to_square in self.tweens:
+            self.squares.update((from_square, to_square))
+        if board.is_en_passant(move):
+            self.squares.add(chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square)))
+        self.elapsed = 0.0
+
+    def positions(self, duration, square_to_pixel):
+        """Текущие (символ фигуры, (x, y)) всех движущихся фигур"""
+        eased = ease_out_cubic(min(1.0, self.elapsed / duration))
+        for symbol, from_square, to_square in self.tweens:
+            start_x, start_y = square_to_pixel(from_square)
+            end_x, end_y = square_to_pixel(to_square)
+            yield symbol, (start_x + (end_x - start_x) * eased, start_y + (end_y - start_y) * eased)
+
+
+class AnimationQueue:
+    """Очередь анимаций ходов, которая продвигается временем кадра (dt из clock.tick)
+
+    Ходы выполняются на доске сразу, очередь только показывает их по порядку.
+    Если ходов накопилось несколько, анимации ускоряются, чтобы догнать партию.
+    """
+    def __init__(self, duration):
+        self.duration = duration
+        self._queue = deque()
+
+    def __bool__(self):
+        return bool(self._queue)
+
+    def __len__(self):
+        return len(self._queue)
+
+    @property
+    def active(self):
+        return self._queue[0] if self._queue else None
+
+    def push(self, board, move):
+        """Добавить ход (board - позиция до хода)"""
+        animation = MoveAnimation(board, move)
+        self._queue.append(animation)
+        return animation
+
+    def update(self, dt):
+        """Продвинуть анимации на dt мс; вернуть завершившиеся"""
+        finished = []
+        step = min(dt, MAX_FRAME_STEP) * len(self._queue)
+        while self._queue and step > 0:
+            animation = self._queue[0]
+            used = min(step, self.duration - animation.elapsed)
+            animation.elapsed += used
+            step -= used
+            if animation.elapsed >= self.duration:
+                finished.append(self._queue.popleft())
+        return finished
+
+    def clear(self):
+        self._queue.clear()
@@ -0,0 +1,137 @@
+"""Сравнение стратегий промпта: токены на ход и доля легальных ответов
+
+Без сети считаются только размеры промптов на позициях из случайных партий.
+С --base-url (или с ключом OpenRouter и --live) для каждой стратегии
+отправляются настоящие запросы и считается доля легальных ответов.
+
+    python benchmarks/prompt_strategies.py --games 20
+    python benchmarks/prompt_strategies.py --live --positions 30 --model openai/gpt-4o-mini
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import chess
+
+from history import MoveHistory
+from metrics import Metrics
+from prompts import get_prompt
+
+DEFAULT_STRATEGIES = "full,fen,window8,grouped"
+PLY_BUCKETS = (10, 40, 80, 160)
+
+
+def make_token_counter():
+    """Подсчет токенов: tiktoken, если установлен, иначе оценка по символам"""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return "tiktoken/cl100k_base", lambda text: len(encoding.encode(text))
+    except ImportError:
+        # Грубая оценка: кириллица и FEN дают примерно 3 символа на токен
+        return "estimate/3-chars", lambda text: (len(text) + 2) // 3
+
+
+def random_positions(games, max_plies, seed):
+    """Позиции (доски с историей) из случайных партий"""
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(games):
+        board = chess.Board()
+        while not board.is_game_over() and len(board.move_stack) < max_plies:
+            positions.append(board.copy())
+            board.push(rng.choice(list(board.legal_moves)))
+    return positions
+
+
+def measure_tokens(strategy, positions, count_tokens):
+    """Токены промпта: среднее, максимум и среднее по глубине партии"""
+    history = MoveHistory()
+    tokens = []
+    by_bucket = {bucket: [] for bucket in PLY_BUCKETS}
+    started = time.perf_counter()
+    for board in positions:
+        pgn, legal_index = history.snapshot(board, None, strategy.history_window)
+        messages = strategy.build(board, pgn, legal_index)
+        count = sum(count_tokens(message["content"]) for message in messages)
+        tokens.append(count)
+        ply = len(board.move_stack)
+        for bucket in PLY_BUCKETS:
+            if ply == bucket:
+                by_bucket[bucket].append(count)
+    elapsed = time.perf_counter() - started
+    return {
+        "mean_tokens": sum(tokens) / len(tokens),
+        "max_tokens": max(tokens),
+        "tokens_at_ply": {str(bucket): (sum(values) / len(values) if values else None)
+                          for bucket, values in by_bucket.items()},
+        "build_us_per_move": elapsed / len(positions) * 1e6,
+    }
+
+
+def measure_legality(strategy, positions, model, base_url, stream):
+    """Настоящие запросы к LLM: доля легальных ответов и токены из usage"""
+    from main import LLMAI
+
+    metrics = Metrics()
+    legal = 0
+    for board in positions:
+        llm_ai = LLMAI(model, base_url=base_url, metrics=metrics, stream=stream, prompt=strategy)
+        if llm_ai.get_llm_move(board) is not None:
+            legal += 1
+        llm_ai.shutdown()
+    snapshot = metrics.snapshot()
+    counters = snapshot["counters"]
+    request_time = snapshot["summaries"].get("llm.request_seconds", {})
+    requests = counters.get("llm.requests", 0)
+    return {
+        "requests": requests,
+        "legal_rate": legal / len(positions) if positions else None,
+        "usage_prompt_tokens_per_move": counters.get("llm.prompt_tokens", 0) / requests if requests else None,
+        "mean_request_seconds": request_time["sum"] / request_time["count"] if request_time else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Токены на ход и легальность ответов для стратегий промпта")
+    parser.add_argument("--strategies", default=DEFAULT_STRATEGIES, help="Список стратегий через запятую")
+    parser.add_argument("--games", type=int, default=20, help="Случайных партий для выборки позиций")
+    parser.add_argument("--max-plies", type=int, default=200, help="Максимум полуходов в партии")
+    parser.add_argument("--seed", type=int, default=1, help="Seed генератора партий")
+    parser.add_argument("--live", action="store_true", help="Отправлять настоящие запросы к LLM")
+    parser.add_argument("--base-url", default=None, help="OpenAI-совместимый API (включает --live)")
+    parser.add_argument("--model", default="meta-llama/llama-4-maverick-17b-128e-instruct:free")
+    parser.add_argument("--positions", type=int, default=20, help="Позиций на стратегию для запросов")
+    parser.add_argument("--no-stream", action="store_true", help="Без потокового ответа")
+    parser.add_argument("--out", default=None, help="Файл JSON с результатами")
+    args = parser.parse_args()
+
+    tokenizer, count_tokens = make_token_counter()
+    positions = random_positions(args.games, args.max_plies, args.seed)
+    sample = random.Random(args.seed).sample(positions, min(args.positions, len(positions)))
+    results = {"tokenizer": tokenizer, "positions": len(positions), "strategies": {}}
+
+    for name in args.strategies.split(","):
+        strategy = get_prompt(name.strip())
+        result = measure_tokens(strategy, positions, count_tokens)
+        if args.live or args.base_url:
+            result.update(measure_legality(strategy, sample, args.model, args.base_url, not args.no_stream))
+        results["strategies"][strategy.cache_tag] = result
+        legal = result.get("legal_rate")
+        legal_text = f", легальных {legal:.0%}" if legal is not None else ""
+        print(f"{strategy.cache_tag}: {result['mean_tokens']:.0f} токенов в среднем, "
+              f"максимум {result['max_tokens']}{legal_text}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Время запуска игры: от импорта main до первого показанного кадра
+
+Каждый замер - отдельный процесс Python (холодный импорт), окно создается
+драйвером SDL dummy, поэтому бенчмарк работает без дисплея. Компьютерный
+игрок - random, чтобы не было сетевых запросов.
+
+    python benchmarks/startup.py --runs 10 --out startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Код дочернего процесса: этапы запуска в секундах от начала импорта
+CHILD = r"""
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import main
+imported = time.perf_counter()
+# Файлы игры - во временной папке: замер не зависит от сохранений пользователя и не меняет их
+main.LLM_CACHE_PATH = os.path.join(sys.argv[2], "llm_cache.sqlite")
+main.AUTOSAVE_PATH = os.path.join(sys.argv[2], "autosave.chs")
+main.SESSIONS_PATH = os.path.join(sys.argv[2], "sessions.chs")
+main.SAVED_GAMES_PATH = os.path.join(sys.argv[2], "saved_games.pgn")
+main.init_display()
+display = time.perf_counter()
+gui = main.ChessBoardGUI()
+created = time.perf_counter()
+gui.render()
+first_frame = time.perf_counter()
+gui.mark_dirty()
+gui.render()
+second_frame = time.perf_counter()
+gui.shutdown()
+print(json.dumps({
+    "import": imported - started,
+    "init_display": display - imported,
+    "create_gui": created - display,
+    "first_frame": first_frame - created,
+    "total": first_frame - started,
+    "next_full_frame": second_frame - first_frame,
+}))
+"""
+
+
+def run_child(tmp_dir):
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy",
+               PYGAME_HIDE_SUPPORT_PROMPT="1", CHESS_AI="random")
+    env.pop("CHESS_METRICS", None)
+    output = subprocess.run([sys.executable, "-c", CHILD, ROOT, tmp_dir], env=env,
+                            capture_output=True, text=True, check=True).stdout
+    # Последняя строка - JSON, выше может быть вывод игры
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время от импорта до первого кадра")
+    parser.add_argument("--runs", type=int, default=5, help="Количество запусков")
+    parser.add_argument("--out", default=None, help="Файл JSON с результатами")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for index in range(args.runs):
+            # Каждый запуск - со своей пустой папкой (холодный кэш, без автосохранения)
+            run_dir = os.path.join(tmp, f"run{index}")
+            os.makedirs(run_dir)
+            runs.append(run_child(run_dir))
+
+    summary = {stage: {"median_ms": statistics.median(run[stage] for run in runs) * 1000,
+                       "max_ms": max(run[stage] for run in runs) * 1000}
+               for stage in runs[0]}
+    for stage, values in summary.items():
+        print(f"{stage:>16}: медиана {values['median_ms']:.1f} мс, максимум {values['max_ms']:.1f} мс")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"runs": runs, "summary": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
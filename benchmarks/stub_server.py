@@ -0,0 +1,184 @@
+"""Локальная заглушка OpenAI-совместимого API для турниров и бенчмарков
+
+Отвечает на POST /v1/chat/completions случайным легальным ходом для позиции,
+найденной в промпте по FEN. Поддерживает потоковые ответы (SSE), задержку
+ответа, долю недопустимых ответов и лимит запросов в минуту (ответ 429).
+
+    python benchmarks/stub_server.py --port 8000 --latency 0.2
+    python tournament.py --base-url http://127.0.0.1:8000/v1 --players llm:a llm:b random
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import chess
+
+_FEN_RE = re.compile(r"([pnbrqkPNBRQK1-8]+(?:/[pnbrqkPNBRQK1-8]+){7} [wb] [KQkq-]+ [a-h1-8-]+ \d+ \d+)")
+
+
+class StubConfig:
+    """Параметры заглушки (можно менять на ходу из бенчмарка)"""
+    def __init__(self, latency=0.0, jitter=0.0, illegal_rate=0.0, rpm=0, seed=None):
+        self.latency = latency  # Задержка перед первым байтом ответа в секундах
+        self.jitter = jitter  # Случайная добавка к задержке (0..jitter)
+        self.illegal_rate = illegal_rate  # Доля ответов без легального хода
+        self.rpm = rpm  # Лимит запросов в минуту на модель (0 - без лимита)
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.rejected = 0
+        self._recent = {}  # модель -> время последних запросов
+        self._lock = threading.Lock()
+
+    def admit(self, model):
+        """Учет запроса; False, если лимит запросов модели превышен"""
+        with self._lock:
+            self.requests += 1
+            if not self.rpm:
+                return True
+            now = time.monotonic()
+            recent = self._recent.setdefault(model, deque())
+            while recent and now - recent[0] > 60.0:
+                recent.popleft()
+            if len(recent) >= self.rpm:
+                self.rejected += 1
+                return False
+            recent.append(now)
+            return True
+
+    def answer(self, messages):
+        """Текст ответа "модели" для промпта"""
+        text = " ".join(message.get("content") or "" for message in messages)
+        match = _FEN_RE.search(text)
+        with self._lock:
+            delay = self.latency + self.random.random() * self.jitter
+            illegal = self.random.random() < self.illegal_rate
+            if match is None or illegal:
+                return delay, "Не знаю"
+            moves = list(chess.Board(match.group(1)).legal_moves)
+            move = self.random.choice(moves) if moves else None
+        return delay, move.uci() if move else "Нет ходов"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, как у настоящего API
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент закрыл keep-alive соединение (отмененный запрос) - это не ошибка
+            self.close_connection = True
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        config = self.server.config
+        model = body.get("model", "stub")
+        if not config.admit(model):
+            self._send_json(429, {"error": {"message": "rate limit", "type": "rate_limit"}},
+                            {"Retry-After": "1"})
+            return
+
+        delay, content = config.answer(body.get("messages", []))
+        time.sleep(delay)
+        usage = {"prompt_tokens": sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4,
+                 "completion_tokens": 2}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+            self._send_stream(model, content, usage if include_usage else None)
+        else:
+            self._send_json(200, {
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            })
+
+    def _send_stream(self, model, content, usage=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        # Ход отдается двумя фрагментами, чтобы проверять разбор по частям
+        parts = [content[:2], content[2:], None]
+        try:
+            for part in parts:
+                choice = {"index": 0, "delta": {"content": part} if part is not None else {},
+                          "finish_reason": None if part is not None else "stop"}
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [choice]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            if usage is not None:
+                # stream_options.include_usage: последний фрагмент без choices, с usage
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [], "usage": usage}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент закрыл поток, как только распознал ход
+            self.close_connection = True
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(config=None, host="127.0.0.1", port=0):
+    """Запуск заглушки в фоновом потоке: (сервер, base_url для клиента)"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.config = config or StubConfig()
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка OpenAI-совместимого API со случайными ходами")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа в секундах")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Случайная добавка к задержке в секундах")
+    parser.add_argument("--illegal-rate", type=float, default=0.0, help="Доля ответов без легального хода")
+    parser.add_argument("--rpm", type=int, default=0, help="Лимит запросов в минуту на модель (429)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.jitter, args.illegal_rate, args.rpm, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    server.config = config
+    print(f"Заглушка API: http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Запросов: {config.requests}, отклонено по лимиту: {config.rejected}")
+
+
+if __name__ == "__main__":
+    main()
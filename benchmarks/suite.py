@@ -0,0 +1,266 @@
+"""Воспроизводимый набор бенчмарков конвейера ходов и отрисовки
+
+Работает без дисплея и сети: окно создается драйвером SDL dummy, LLM
+заменяет локальная заглушка API (benchmarks/stub_server.py) с заданной
+задержкой. Партии играются настоящим ChessBoardGUI: ходы игрока выбираются
+генератором с фиксированным seed, ходы компьютера запрашиваются у заглушки
+через LLMAI. Измеряются:
+- время построения промпта в зависимости от номера полухода;
+- перцентили времени кадра (отрисовка и игровая логика, без ожидания FPS);
+- доля случайных ходов вместо ответа LLM (fallback);
+- сквозная скорость партий в полуходах в секунду.
+
+Результаты сохраняются в JSON вместе с параметрами запуска и версиями,
+чтобы запуски можно было сравнивать между собой.
+
+    python benchmarks/suite.py --games 4 --latency 0.05 --out results/bench.json
+    python benchmarks/suite.py --fps 0 --animation-ms 1  # только конвейер ходов
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.environ.pop("CHESS_METRICS", None)
+
+from history import MoveHistory
+from prompt_strategies import random_positions
+from prompts import get_prompt
+from stub_server import StubConfig, start_stub_server
+
+PLY_BUCKET = 20  # Ширина интервала полуходов для времени построения промпта
+PERCENTILES = (50, 90, 95, 99)
+PLAYER_DELAY_FRAMES = 3  # Кадров между выбором фигуры и ходом "игрока"
+
+
+def percentiles(values):
+    """Перцентили, среднее и максимум (в миллисекундах из секунд)"""
+    ordered = sorted(values)
+    result = {f"p{p}": ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000 for p in PERCENTILES}
+    result["mean"] = statistics.fmean(ordered) * 1000
+    result["max"] = ordered[-1] * 1000
+    return result
+
+
+def bench_prompt_build(strategy_name, games, max_plies, repeats, seed):
+    """Время построения промпта (история + легальные ходы + текст) по номеру полухода
+
+    Позиции подаются в порядке партий, как в игре, поэтому история ходов
+    досчитывается инкрементально. Для каждой позиции берется лучшее время из
+    repeats проходов, по интервалу полуходов - медиана.
+    """
+    strategy = get_prompt(strategy_name)
+    positions = random_positions(games, max_plies, seed)
+    best = [float("inf")] * len(positions)
+    for _ in range(repeats):
+        history = MoveHistory()
+        for index, board in enumerate(positions):
+            started = time.perf_counter()
+            pgn, legal_index = history.snapshot(board, None, strategy.history_window)
+            strategy.build(board, pgn, legal_index)
+            best[index] = min(best[index], time.perf_counter() - started)
+
+    buckets = {}
+    for board, seconds in zip(positions, best):
+        buckets.setdefault(len(board.move_stack) // PLY_BUCKET * PLY_BUCKET, []).append(seconds)
+    return {
+        "strategy": strategy_name,
+        "positions": len(positions),
+        "median_us": statistics.median(best) * 1e6,
+        "by_ply": [{"ply": ply, "positions": len(values), "median_us": statistics.median(values) * 1e6,
+                    "max_us": max(values) * 1e6}
+                   for ply, values in sorted(buckets.items())],
+    }
+
+
+def play_scripted_games(main, games, max_plies, fps, seed):
+    """Партии в ChessBoardGUI: случайный "игрок" против LLM-заглушки
+
+    Каждый кадр повторяет основной цикл ChessBoardGUI.run: события,
+    отрисовка, запрос или проверка хода компьютера. Игрок выбирает фигуру
+    (подсветка ходов), через несколько кадров ходит, но только когда
+    анимация закончилась - как человек, который видит доску.
+    """
+    import pygame
+
+    rng = random.Random(seed)
+    frame_times = []
+    drawn_times = []  # Кадры, в которых что-то перерисовывалось
+    plies = 0
+    gui = main.ChessBoardGUI()
+    started = time.perf_counter()
+    for _ in range(games):
+        gui.new_game()
+        selected = None
+        wait = 0
+        while not gui.game_over and len(gui.record) < max_plies:
+            frame_started = time.perf_counter()
+            pygame.event.pump()
+            if gui.is_player_turn and not gui.animations:
+                if selected is None:
+                    selected = rng.choice(list(gui.board.legal_moves))
+                    gui.set_selection(selected.from_square)
+                    wait = PLAYER_DELAY_FRAMES
+                elif wait:
+                    wait -= 1
+                else:
+                    gui.set_selection(None)
+                    gui.push_move(selected)
+                    gui.is_player_turn = False
+                    selected = None
+
+            drawn = gui.full_redraw or bool(gui.dirty_rects) or bool(gui.animations)
+            gui.render()
+            if not gui.is_player_turn and not gui.game_over:
+                if gui.pending_ai_move is None:
+                    gui.get_ai_move()
+                else:
+                    gui.poll_ai_move()
+            frame_time = time.perf_counter() - frame_started
+            frame_times.append(frame_time)
+            if drawn:
+                drawn_times.append(frame_time)
+            gui.frame_dt = gui.clock.tick(fps)
+        plies += len(gui.record)
+    elapsed = time.perf_counter() - started
+
+    snapshot = gui.metrics.snapshot()
+    gui.shutdown()
+    return elapsed, plies, frame_times, drawn_times, snapshot
+
+
+def bench_games(args, tmp):
+    """Сквозной бенчмарк партий в интерфейсе против заглушки"""
+    import main
+
+    # Все файлы игры - во временной папке, чтобы запуск не зависел от прошлых
+    main.LLM_CACHE_PATH = os.path.join(tmp, "llm_cache.sqlite")
+    main.AUTOSAVE_PATH = os.path.join(tmp, "autosave.chs")
+    main.SESSIONS_PATH = os.path.join(tmp, "sessions.chs")
+    main.SAVED_GAMES_PATH = os.path.join(tmp, "saved_games.pgn")
+    main.METRICS_PATH = os.path.join(tmp, "metrics.jsonl")
+    main.AI_PLAYER = f"llm:{args.model}"
+    main.PONDER_ENABLED = args.ponder
+    if args.animation_ms is not None:
+        # Игрок ждет конца анимации, поэтому она ограничивает скорость партии
+        main.ANIMATION_DURATION = max(1, args.animation_ms)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed, plies, frame_times, drawn_times, snapshot = play_scripted_games(
+            main, args.games, args.max_plies, args.fps, args.seed)
+
+    counters = snapshot["counters"]
+    summaries = snapshot["summaries"]
+    ai_moves = counters.get("moves.ai", 0)
+    request_time = summaries.get("llm.request_seconds")
+    prompt_time = summaries.get("llm.prompt_build_seconds")
+    return {
+        "games": args.games,
+        "plies": plies,
+        "seconds": elapsed,
+        "moves_per_second": plies / elapsed,
+        "ai_moves": ai_moves,
+        "fallback_rate": counters.get("moves.fallback", 0) / ai_moves if ai_moves else None,
+        "llm_requests": counters.get("llm.requests", 0),
+        "llm_errors": counters.get("llm.errors", 0),
+        "mean_request_ms": request_time["sum"] / request_time["count"] * 1000 if request_time else None,
+        "mean_prompt_build_us": prompt_time["sum"] / prompt_time["count"] * 1e6 if prompt_time else None,
+        "frames": len(frame_times),
+        "frame_ms": percentiles(frame_times),
+        "drawn_frames": len(drawn_times),
+        "drawn_frame_ms": percentiles(drawn_times) if drawn_times else None,
+    }
+
+
+def environment():
+    """Версии и коммит - для сравнения запусков"""
+    import chess
+    import pygame
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pygame": pygame.version.ver,
+        "python-chess": chess.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки построения промпта, кадров и скорости партий")
+    parser.add_argument("--games", type=int, default=2, help="Партий в интерфейсе")
+    parser.add_argument("--max-plies", type=int, default=60, help="Максимум полуходов в партии")
+    parser.add_argument("--fps", type=int, default=60, help="Ограничение FPS (0 - без ограничения)")
+    parser.add_argument("--animation-ms", type=int, default=None,
+                        help="Длительность анимации хода (по умолчанию как в игре)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed ходов игрока и заглушки")
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка ответа заглушки в секундах")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Случайная добавка к задержке в секундах")
+    parser.add_argument("--illegal-rate", type=float, default=0.1, help="Доля ответов заглушки без легального хода")
+    parser.add_argument("--model", default="bench/stub", help="Имя модели в запросах к заглушке")
+    parser.add_argument("--ponder", action="store_true", help="Включить запросы на вероятные ходы игрока")
+    parser.add_argument("--prompt", default="full", help="Стратегия промпта для замера построения")
+    parser.add_argument("--prompt-games", type=int, default=20, help="Случайных партий для замера промпта")
+    parser.add_argument("--prompt-repeats", type=int, default=3, help="Проходов замера промпта")
+    parser.add_argument("--out", default=None,
+                        help="Файл JSON с результатами (по умолчанию results/benchmark-<время>.json)")
+    args = parser.parse_args()
+
+    results = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "config": vars(args),
+    }
+
+    results["prompt_build"] = bench_prompt_build(args.prompt, args.prompt_games, 200,
+                                                 args.prompt_repeats, args.seed)
+    print(f"Построение промпта ({args.prompt}), медиана по полуходам:")
+    for bucket in results["prompt_build"]["by_ply"]:
+        print(f"  {bucket['ply']:>4}+: {bucket['median_us']:8.1f} мкс")
+
+    stub = StubConfig(latency=args.latency, jitter=args.jitter, illegal_rate=args.illegal_rate, seed=args.seed)
+    server, base_url = start_stub_server(stub)
+    # Клиент LLMAI по умолчанию подключается к OPENROUTER_BASE_URL - направляем его на заглушку
+    import llm_client
+    llm_client.OPENROUTER_BASE_URL = base_url
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            results["games"] = bench_games(args, tmp)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    games = results["games"]
+    frame = games["drawn_frame_ms"] or games["frame_ms"]
+    print(f"Партий: {games['games']}, полуходов: {games['plies']}, {games['moves_per_second']:.1f} полуходов/с")
+    print(f"Доля случайных ходов: {games['fallback_rate']:.1%}, запросов к LLM: {games['llm_requests']}")
+    print(f"Кадр с перерисовкой ({games['drawn_frames']} из {games['frames']}): p50 {frame['p50']:.2f} мс, p95 {frame['p95']:.2f} мс, "
+          f"p99 {frame['p99']:.2f} мс, максимум {frame['max']:.2f} мс")
+
+    out = args.out or os.path.join(ROOT, "results", time.strftime("benchmark-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Пропускная способность турнира против локальной заглушки API
+
+Запускает заглушку (benchmarks/stub_server.py) в этом же процессе и играет
+один и тот же короткий турнир при разном числе одновременных партий.
+
+    python benchmarks/tournament_throughput.py --latency 0.2 --concurrency 1,4,16
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from llm_client import get_client, close_clients
+from metrics import Metrics
+from prompts import get_prompt
+from rate_limit import RateLimiter
+from stub_server import StubConfig, start_stub_server
+from tournament import run_tournament
+
+
+def run_once(base_url, players, concurrency, games_per_pair, max_plies, rpm, stub):
+    metrics = Metrics()
+    llm_options = {"client": get_client(base_url, max_connections=concurrency * 2), "metrics": metrics,
+                   "prompt": get_prompt("fen"), "rate_limiter": RateLimiter(rpm)}
+    requests_before = stub.requests
+    with tempfile.TemporaryDirectory() as out_dir, contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        run_tournament(players, out_dir, games_per_pair=games_per_pair, concurrency=concurrency,
+                       max_plies=max_plies, llm_options=llm_options, metrics=metrics)
+        elapsed = time.perf_counter() - started
+    snapshot = metrics.snapshot()
+    counters = snapshot["counters"]
+    wait = snapshot["summaries"].get("llm.rate_limit_wait_seconds", {"sum": 0.0})
+    requests = stub.requests - requests_before
+    return {
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "games_per_minute": len(players) * (len(players) - 1) // 2 * games_per_pair / elapsed * 60,
+        "requests_per_second": requests / elapsed,
+        "moves_per_second": counters.get("moves.played", 0) / elapsed,
+        "fallback_rate": counters.get("moves.fallback", 0) / max(1, counters.get("moves.played", 0)),
+        "rate_limit_wait_seconds": wait["sum"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Партий в минуту при разной параллельности турнира")
+    parser.add_argument("--players", type=int, default=4, help="Сколько LLM моделей-заглушек")
+    parser.add_argument("--games-per-pair", type=int, default=2)
+    parser.add_argument("--max-plies", type=int, default=40)
+    parser.add_argument("--concurrency", default="1,4,16", help="Значения через запятую")
+    parser.add_argument("--latency", type=float, default=0.1, help="Задержка ответа заглушки в секундах")
+    parser.add_argument("--rpm", type=int, default=6000, help="Лимит запросов в минуту на модель")
+    parser.add_argument("--out", default=None, help="Файл JSON с результатами")
+    args = parser.parse_args()
+
+    stub = StubConfig(latency=args.latency, seed=1)
+    server, base_url = start_stub_server(stub)
+    players = [f"llm:stub-{index}" for index in range(args.players)]
+    results = []
+    try:
+        for concurrency in (int(value) for value in args.concurrency.split(",")):
+            result = run_once(base_url, players, concurrency, args.games_per_pair,
+                              args.max_plies, args.rpm, stub)
+            results.append(result)
+            print(f"{concurrency:>3} партий одновременно: {result['games_per_minute']:.1f} партий/мин, "
+                  f"{result['requests_per_second']:.1f} запросов/с, "
+                  f"ожидание лимита {result['rate_limit_wait_seconds']:.1f} с")
+    finally:
+        server.shutdown()
+        close_clients()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"latency": args.latency, "rpm": args.rpm, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
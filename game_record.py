@@ -0,0 +1,240 @@
+"""Запись партии с быстрым переходом к любому полуходу и работа с PGN
+
+GameRecord хранит ходы, их SAN, ключи Zobrist после каждого полухода и
+снимки доски каждые SNAPSHOT_INTERVAL полуходов. Позиция на любом полуходе
+восстанавливается от ближайшего снимка не больше чем за SNAPSHOT_INTERVAL ходов,
+а не проигрыванием партии с начала. Ключи Zobrist (самая дорогая часть)
+считаются при первом обращении, поэтому массовая загрузка PGN их не ждет.
+
+PgnArchive индексирует большой PGN файл (смещения и заголовки партий) без
+разбора ходов и загружает партии по требованию.
+"""
+import itertools
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+SNAPSHOT_INTERVAL = 16  # Снимок доски каждые N полуходов
+STANDARD_HEADERS = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+
+
+class GameRecord:
+    """Ходы партии, SAN, ключи Zobrist и периодические снимки доски"""
+    def __init__(self, board=None, headers=None, snapshot_interval=SNAPSHOT_INTERVAL):
+        start = board.copy(stack=False) if board is not None else chess.Board()
+        self.headers = dict(headers or {})
+        self.snapshot_interval = snapshot_interval
+        self.moves = []
+        self.san_moves = []
+        self._keys = []  # Ключ Zobrist позиции после ply полуходов (досчитывается по запросу)
+        self._snapshots = [start.copy(stack=False)]
+        self._board = start  # Текущая (последняя) позиция записи
+        self._positions = {}  # Ключ Zobrist -> полуходы, где позиция встречалась
+
+    def __len__(self):
+        return len(self.moves)
+
+    @property
+    def start_board(self):
+        return self._snapshots[0].copy(stack=False)
+
+    def append(self, move, san=None):
+        """Добавить ход в конец записи (san - уже известная запись хода)"""
+        board = self._board
+        self.san_moves.append(san or board.san(move))
+        board.push(move)
+        self.moves.append(move)
+        if len(self.moves) % self.snapshot_interval == 0:
+            self._snapshots.append(board.copy(stack=False))
+
+    def extend(self, moves):
+        for move in moves:
+            self.append(move)
+
+    def board_at(self, ply):
+        """Позиция после ply полуходов (без истории ходов до ближайшего снимка)"""
+        ply = max(0, min(ply, len(self.moves)))
+        base = ply // self.snapshot_interval
+        board = self._snapshots[base].copy(stack=False)
+        for move in self.moves[base * self.snapshot_interval:ply]:
+            board.push(move)
+        return board
+
+    def board(self):
+        """Последняя позиция записи с полной историей ходов (для продолжения игры)"""
+        board = self.start_board
+        for move in self.moves:
+            board.push(move)
+        return board
+
+    def key_at(self, ply):
+        """Ключ Zobrist позиции после ply полуходов"""
+        self._update_keys()
+        return self._keys[ply]
+
+    def plies_of(self, board_or_key):
+        """Полуходы, после которых встречалась позиция (по ключу Zobrist)"""
+        key = board_or_key if isinstance(board_or_key, int) else chess.polyglot.zobrist_hash(board_or_key)
+        self._update_keys()
+        return list(self._positions.get(key, ()))
+
+    def _update_keys(self):
+        """Досчитать ключи для ходов, добавленных после прошлого обращения"""
+        if len(self._keys) == len(self.moves) + 1:
+            return
+        ply = max(0, len(self._keys) - 1)
+        board = self.board_at(ply)
+        if not self._keys:
+            self._add_key(board, 0)
+        for move in self.moves[ply:]:
+            board.push(move)
+            ply += 1
+            self._add_key(board, ply)
+
+    def _add_key(self, board, ply):
+        key = chess.polyglot.zobrist_hash(board)
+        self._keys.append(key)
+        self._positions.setdefault(key, []).append(ply)
+
+    def result(self):
+        result = self.headers.get("Result")
+        if result and result != "*":
+            return result
+        outcome = self._board.outcome()
+        return outcome.result() if outcome is not None else "*"
+
+    def pgn(self):
+        """Текст партии в формате PGN"""
+        headers = {name: "?" for name in STANDARD_HEADERS}
+        headers.update(self.headers)
+        headers["Result"] = self.result()
+        start = self._snapshots[0]
+        if start.fen() != chess.STARTING_FEN:
+            headers["SetUp"] = "1"
+            headers["FEN"] = start.fen()
+        lines = [f'[{name} "{value}"]' for name, value in headers.items()]
+
+        tokens = []
+        number = start.fullmove_number
+        turn = start.turn
+        for index, san in enumerate(self.san_moves):
+            if turn == chess.WHITE:
+                tokens.append(f"{number}. {san}")
+            elif index == 0:
+                tokens.append(f"{number}... {san}")
+            else:
+                tokens.append(san)
+            if turn == chess.BLACK:
+                number += 1
+            turn = not turn
+        tokens.append(headers["Result"])
+        return "\n".join(lines) + "\n\n" + _wrap(tokens) + "\n"
+
+    @classmethod
+    def from_board(cls, board, headers=None):
+        """Запись по доске с историей ходов"""
+        root = board.root()
+        record = cls(root, headers)
+        record.extend(board.move_stack)
+        return record
+
+
+class _RecordVisitor(chess.pgn.BaseVisitor):
+    """Разбор PGN сразу в GameRecord, без дерева GameNode и без вариантов"""
+    def begin_game(self):
+        self.headers = {}
+        self.record = None
+
+    def visit_header(self, tagname, tagvalue):
+        self.headers[tagname] = tagvalue
+
+    def visit_board(self, board):
+        if self.record is None:
+            self.record = GameRecord(board, self.headers)
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def visit_move(self, board, move):
+        self.record.append(move)
+
+    def handle_error(self, error):
+        raise error
+
+    def result(self):
+        return self.record
+
+
+def read_record(handle):
+    """Следующая партия из открытого PGN файла или None"""
+    return chess.pgn.read_game(handle, Visitor=_RecordVisitor)
+
+
+def load_pgn(path):
+    """Все партии PGN файла (партии с ошибками пропускаются)"""
+    records = []
+    with open(path, encoding="utf-8-sig") as handle:
+        for number in itertools.count(1):
+            offset = handle.tell()
+            try:
+                record = read_record(handle)
+            except ValueError as e:
+                # Недопустимый ход: разбор остановился внутри партии, переходим к следующей
+                print(f"Пропущена партия #{number} в {path}: {e}")
+                handle.seek(offset)
+                chess.pgn.skip_game(handle)
+                continue
+            if record is None:
+                break
+            records.append(record)
+    return records
+
+
+def save_pgn(path, records, append=False):
+    """Запись партий в PGN файл одним проходом"""
+    with open(path, "a" if append else "w", encoding="utf-8") as handle:
+        # Партии разделяются пустой строкой, иначе заголовки новой партии
+        # прилипнут к ходам последней партии файла
+        separator = "\n" if append and handle.tell() else ""
+        handle.write(separator + "\n".join(record.pgn() for record in records))
+
+
+class PgnArchive:
+    """Индекс большого PGN файла: заголовки и смещения партий, ходы - по требованию"""
+    def __init__(self, path):
+        self.path = path
+        self.offsets = []
+        self.headers = []
+        self._handle = open(path, encoding="utf-8-sig")
+        while True:
+            offset = self._handle.tell()
+            headers = chess.pgn.read_headers(self._handle)
+            if headers is None:
+                break
+            self.offsets.append(offset)
+            self.headers.append(dict(headers))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        """Партия по номеру (GameRecord); ValueError, если в ходах партии ошибка"""
+        self._handle.seek(self.offsets[index])
+        return read_record(self._handle)
+
+    def close(self):
+        self._handle.close()
+
+
+def _wrap(tokens, width=80):
+    lines = []
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > width:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines)
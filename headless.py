@@ -0,0 +1,211 @@
+"""Безголовый запуск партий (без pygame-окна) для оценки LLM
+
+Примеры:
+    python headless.py --white llm:meta-llama/llama-4-maverick-17b-128e-instruct:free --black random --games 100
+    python headless.py --white llm:openai/gpt-4o-mini --black uci:/usr/bin/stockfish --games 20 --concurrency 8
+    python headless.py --white book:book.bin,llm:openai/gpt-4o-mini,uci:/usr/bin/stockfish --black random
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import chess
+import chess.pgn
+
+from llm_cache import MoveCache
+from llm_client import get_client, close_clients, MAX_CONNECTIONS
+from main import LLMAI
+from metrics import Metrics, NULL_METRICS
+from prompts import get_prompt
+from providers import ProviderFactory, ENGINE_MOVE_TIME, COMPOSITE_BUDGET
+
+MAX_PLIES = 400  # Ограничение длины партии в полуходах
+
+
+def play_game(game_id, white, black, max_plies=MAX_PLIES, metrics=NULL_METRICS):
+    """Сыграть одну партию, вернуть PGN и статистику"""
+    board = chess.Board()
+    players = {chess.WHITE: white, chess.BLACK: black}
+    fallbacks = {chess.WHITE: 0, chess.BLACK: 0}
+    think_time = {chess.WHITE: 0.0, chess.BLACK: 0.0}
+    started = time.perf_counter()
+
+    while not board.is_game_over() and len(board.move_stack) < max_plies:
+        turn = board.turn
+        move_start = time.perf_counter()
+        try:
+            move = players[turn].get_move(board)
+        except Exception as e:
+            print(f"Партия {game_id}: ошибка игрока {players[turn].name}: {e}")
+            move = None
+        think_time[turn] += time.perf_counter() - move_start
+        metrics.incr("moves.played")
+
+        if move is None or not board.is_legal(move):
+            # Fallback к случайному ходу, как в GUI
+            fallbacks[turn] += 1
+            metrics.incr("moves.fallback")
+            move = random.choice(list(board.legal_moves))
+        board.push(move)
+
+    outcome = board.outcome()
+    if outcome is not None:
+        result = outcome.result()
+        termination = outcome.termination.name.lower()
+    else:
+        result = "*"
+        termination = "max_plies"
+
+    game = chess.pgn.Game.from_board(board)
+    game.headers["Event"] = "Headless match"
+    game.headers["Round"] = str(game_id)
+    game.headers["White"] = white.name
+    game.headers["Black"] = black.name
+    game.headers["Result"] = result
+    game.headers["Termination"] = termination
+
+    stats = {
+        "game_id": game_id,
+        "white": white.name,
+        "black": black.name,
+        "result": result,
+        "termination": termination,
+        "plies": len(board.move_stack),
+        "fallbacks_white": fallbacks[chess.WHITE],
+        "fallbacks_black": fallbacks[chess.BLACK],
+        "think_time_white": round(think_time[chess.WHITE], 3),
+        "think_time_black": round(think_time[chess.BLACK], 3),
+        "duration": round(time.perf_counter() - started, 3),
+    }
+    metrics.record("game", **stats)
+    return game, stats
+
+
+def run_match(white_spec, black_spec, games, concurrency, out_dir,
+              swap_colors=False, max_plies=MAX_PLIES, move_time=ENGINE_MOVE_TIME, llm_options=None,
+              metrics=NULL_METRICS, budget=COMPOSITE_BUDGET):
+    """Сыграть серию партий параллельно и сохранить PGN и статистику"""
+    os.makedirs(out_dir, exist_ok=True)
+    pgn_path = os.path.join(out_dir, "games.pgn")
+    stats_path = os.path.join(out_dir, "stats.jsonl")
+    # Параметры LLMAI (client, cache, samples, quorum, metrics, stream, prompt)
+    llm_options = llm_options or {}
+
+    def llm_factory(model_name):
+        return LLMAI(model_name, **llm_options)
+
+    factories = {
+        "white": ProviderFactory(white_spec, move_time, llm_factory, budget, metrics),
+        "black": ProviderFactory(black_spec, move_time, llm_factory, budget, metrics),
+    }
+    scores = {}
+
+    def run_one(game_id):
+        first, second = factories["white"], factories["black"]
+        if swap_colors and game_id % 2 == 1:
+            first, second = second, first
+        white, black = first.create(), second.create()
+        try:
+            return play_game(game_id, white, black, max_plies, metrics)
+        finally:
+            white.close()
+            black.close()
+
+    try:
+        with open(pgn_path, "a", encoding="utf-8") as pgn_file, \
+                open(stats_path, "a", encoding="utf-8") as stats_file, \
+                ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="game") as pool:
+            futures = [pool.submit(run_one, game_id) for game_id in range(1, games + 1)]
+            for future in as_completed(futures):
+                game, stats = future.result()
+                print(game, file=pgn_file, end="\n\n")
+                stats_file.write(json.dumps(stats, ensure_ascii=False) + "\n")
+                pgn_file.flush()
+                stats_file.flush()
+                add_score(scores, stats)
+                print(f"Партия {stats['game_id']}: {stats['white']} - {stats['black']} "
+                      f"{stats['result']} ({stats['termination']}, {stats['plies']} полуходов)")
+    finally:
+        for factory in factories.values():
+            factory.close()
+
+    return scores
+
+
+def empty_score():
+    """Пустая строка таблицы очков игрока"""
+    return {"games": 0, "wins": 0, "draws": 0, "losses": 0, "score": 0.0, "fallbacks": 0}
+
+
+def add_score(scores, stats):
+    """Учет очков, побед/ничьих/поражений и случайных ходов игроков по результату партии"""
+    # Незавершенная партия (лимит полуходов) считается ничьей
+    points = {"1-0": 1.0, "0-1": 0.0}.get(stats["result"], 0.5)
+    for name, point, fallbacks in ((stats["white"], points, stats["fallbacks_white"]),
+                                   (stats["black"], 1.0 - points, stats["fallbacks_black"])):
+        entry = scores.setdefault(name, empty_score())
+        entry["games"] += 1
+        entry["score"] += point
+        entry["fallbacks"] += fallbacks
+        entry["wins" if point == 1.0 else "losses" if point == 0.0 else "draws"] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Безголовые партии LLM без pygame-окна")
+    parser.add_argument("--white", default="llm:meta-llama/llama-4-maverick-17b-128e-instruct:free",
+                        help="Игрок белыми: random, llm:<модель>, uci:<путь к движку>, book:<файл Polyglot> "
+                             "или несколько через запятую (последний - запасной)")
+    parser.add_argument("--black", default="random", help="Игрок черными (формат как у --white)")
+    parser.add_argument("--games", type=int, default=10, help="Количество партий")
+    parser.add_argument("--concurrency", type=int, default=4, help="Число партий одновременно")
+    parser.add_argument("--out", default="results", help="Папка для PGN и статистики")
+    parser.add_argument("--swap-colors", action="store_true", help="Менять цвета в каждой второй партии")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES, help="Максимум полуходов в партии")
+    parser.add_argument("--move-time", type=float, default=ENGINE_MOVE_TIME,
+                        help="Время на ход UCI движка в секундах")
+    parser.add_argument("--budget", type=float, default=COMPOSITE_BUDGET,
+                        help="Бюджет времени на ход для составного игрока в секундах")
+    parser.add_argument("--cache", default=None, help="Файл SQLite для кэша ответов LLM")
+    parser.add_argument("--samples", type=int, default=1, help="Параллельных запросов к LLM на ход")
+    parser.add_argument("--quorum", type=int, default=1, help="Одинаковых легальных ответов для выбора хода")
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI-совместимый API (по умолчанию OpenRouter, можно локальную заглушку)")
+    parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS,
+                        help="Максимум HTTP соединений к API")
+    parser.add_argument("--prompt", default="full",
+                        help="Стратегия промпта: full, fen, window, window<N>, grouped")
+    parser.add_argument("--no-stream", action="store_true", help="Ждать полный ответ LLM вместо потокового")
+    parser.add_argument("--metrics", default=None,
+                        help="JSONL файл метрик (рядом сохраняется .prom в формате Prometheus)")
+    args = parser.parse_args()
+
+    cache = MoveCache(args.cache) if args.cache else None
+    client = get_client(args.base_url, max_connections=args.max_connections)
+    metrics = Metrics(args.metrics) if args.metrics else NULL_METRICS
+    llm_options = {"client": client, "cache": cache, "samples": args.samples, "quorum": args.quorum,
+                   "metrics": metrics, "stream": not args.no_stream, "prompt": get_prompt(args.prompt)}
+    try:
+        scores = run_match(args.white, args.black, args.games, args.concurrency, args.out,
+                           args.swap_colors, args.max_plies, args.move_time, llm_options, metrics,
+                           args.budget)
+    finally:
+        if cache is not None:
+            print(f"Кэш LLM: {cache.stats()}")
+            cache.close()
+        close_clients()
+        if metrics.enabled:
+            metrics.write_prometheus(os.path.splitext(args.metrics)[0] + ".prom")
+            metrics.close()
+
+    print("=== ИТОГИ ===")
+    for name, entry in sorted(scores.items(), key=lambda item: -item[1]["score"]):
+        print(f"{name}: {entry['score']}/{entry['games']} (случайных ходов: {entry['fallbacks']})")
+
+
+if __name__ == "__main__":
+    main()
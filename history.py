@@ -0,0 +1,179 @@
+import random
+import threading
+
+import chess
+
+
+class LegalMoveIndex:
+    """Легальные ходы одной позиции, сгенерированные один раз
+
+    Индекс неизменяем, поэтому его можно передавать между потоками и
+    использовать везде (GUI, промпт LLM, случайный ход) до следующего хода.
+    """
+    def __init__(self, board):
+        self.board = board.copy(stack=False)
+        self.moves = list(board.legal_moves)
+        self._move_set = set(self.moves)
+        self.by_uci = {move.uci(): move for move in self.moves}
+        # Клетка откуда -> клетка куда -> ходы (несколько при превращении пешки)
+        self.targets = {}
+        for move in self.moves:
+            self.targets.setdefault(move.from_square, {}).setdefault(move.to_square, []).append(move)
+        self._uci_str = None
+        self._by_san = None
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __iter__(self):
+        return iter(self.moves)
+
+    def __contains__(self, move):
+        return move in self._move_set
+
+    def destinations(self, from_square):
+        """Клетки, на которые может пойти фигура"""
+        return list(self.targets.get(from_square, ()))
+
+    def variants(self, from_square, to_square):
+        """Все ходы между двумя клетками (варианты превращения пешки)"""
+        return self.targets.get(from_square, {}).get(to_square, [])
+
+    def find(self, from_square, to_square, promotion=chess.QUEEN):
+        """Ход между клетками; при превращении выбирается указанная фигура"""
+        variants = self.variants(from_square, to_square)
+        for move in variants:
+            if move.promotion == promotion:
+                return move
+        return variants[0] if variants else None
+
+    def get_uci(self, move_uci):
+        """Легальный ход по UCI коду или None"""
+        return self.by_uci.get(move_uci)
+
+    def get_san(self, move_san):
+        """Легальный ход по SAN (без учета +, # и = при превращении) или None"""
+        if self._by_san is None:
+            # Строится лениво: SAN нужен только для разбора ответов LLM
+            by_san = {}
+            for move in self.moves:
+                by_san[_normalize_san(self.board.san(move))] = move
+            self._by_san = by_san
+        return self._by_san.get(_normalize_san(move_san))
+
+    def uci_str(self):
+        """Легальные ходы через запятую (для промпта)"""
+        if self._uci_str is None:
+            self._uci_str = ", ".join(self.by_uci)
+        return self._uci_str
+
+    def random_move(self):
+        return random.choice(self.moves)
+
+
+def _normalize_san(move_san):
+    return move_san.rstrip("+#!?").replace("=", "").replace("0", "O")
+
+
+class MoveHistory:
+    """История ходов партии с инкрементальным построением SAN/PGN"""
+    def __init__(self):
+        self.san_moves = []
+        self.uci_moves = []
+        self._moves = []
+        self._root = chess.Board()  # Начальная позиция истории
+        self._board = chess.Board()  # Доска, синхронная с историей
+        self._pgn = None
+        self._legal_index = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.uci_moves)
+
+    def __getitem__(self, index):
+        return self.uci_moves[index]
+
+    def __iter__(self):
+        return iter(self.uci_moves)
+
+    def push(self, move):
+        """Добавление одного хода: SAN считается только для него"""
+        with self._lock:
+            self._push(move)
+
+    def sync(self, board):
+        """Приведение истории к позиции доски, досчитывая только новые ходы"""
+        with self._lock:
+            self._sync(board)
+
+    def _sync(self, board):
+        stack = board.move_stack
+        root = board.root()
+        # Откатываемся до последнего общего хода: общим считается только
+        # совпадающее начало партии из той же начальной позиции
+        common = min(len(self._moves), len(stack))
+        if root != self._root:
+            common = 0
+        elif self._moves[:common] != stack[:common]:
+            common = next(i for i, (ours, theirs) in enumerate(zip(self._moves, stack)) if ours != theirs)
+        if common == 0:
+            # Нет общих ходов - начинаем со стартовой позиции доски
+            self._reset_to_root(root)
+        while len(self._moves) > common:
+            self._board.pop()
+            self._moves.pop()
+            self.san_moves.pop()
+            self.uci_moves.pop()
+            self._invalidate()
+        for move in stack[len(self._moves):]:
+            self._push(move)
+
+    def snapshot(self, board, legal_index=None, window=None):
+        """Синхронизация с доской и получение пары (PGN, индекс легальных ходов)
+
+        Готовый индекс для позиции доски (например, из GUI) используется
+        вместо повторной генерации ходов. window ограничивает историю
+        последними ходами (None - вся история, 0 - без истории).
+        """
+        with self._lock:
+            self._sync(board)
+            if legal_index is not None and self._legal_index is None:
+                self._legal_index = legal_index
+            if window is None:
+                pgn = self.pgn()
+            elif window == 0:
+                pgn = ""
+            else:
+                pgn = " ".join(self.san_moves[-window:])
+            return pgn, self.legal_index()
+
+    def pgn(self):
+        """История ходов в виде строки SAN (кэшируется до следующего хода)"""
+        if self._pgn is None:
+            self._pgn = " ".join(self.san_moves)
+        return self._pgn
+
+    def legal_index(self):
+        """Индекс легальных ходов текущей позиции (строится один раз на позицию)"""
+        if self._legal_index is None:
+            self._legal_index = LegalMoveIndex(self._board)
+        return self._legal_index
+
+    def _push(self, move):
+        self.san_moves.append(self._board.san(move))
+        self.uci_moves.append(move.uci())
+        self._moves.append(move)
+        self._board.push(move)
+        self._invalidate()
+
+    def _reset_to_root(self, root):
+        self.san_moves = []
+        self.uci_moves = []
+        self._moves = []
+        self._root = root.copy()
+        self._board = root
+        self._invalidate()
+
+    def _invalidate(self):
+        self._pgn = None
+        self._legal_index = None
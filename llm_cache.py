@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+CACHE_CAPACITY = 4096  # Количество позиций в памяти
+
+
+class MoveCache:
+    """Кэш ответов LLM по позиции: LRU в памяти и SQLite на диске
+
+    Ключ - (модель, нормализованный FEN, стратегия и версия промпта, температура).
+    Нормализованный FEN (EPD) не содержит счетчиков ходов, поэтому одна и та же
+    позиция совпадает независимо от пути, которым к ней пришли.
+    """
+    def __init__(self, path=None, capacity=CACHE_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS moves ("
+                "model TEXT, fen TEXT, prompt_version TEXT, temperature REAL, move TEXT, "
+                "PRIMARY KEY (model, fen, prompt_version, temperature))"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model, board, prompt_version, temperature):
+        """Ключ кэша для позиции на доске"""
+        return (model, board.epd(), prompt_version, float(temperature))
+
+    def get(self, key):
+        """Получить UCI ход из кэша или None"""
+        with self._lock:
+            move = self._memory.get(key)
+            if move is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return move
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT move FROM moves WHERE model=? AND fen=? AND prompt_version=? AND temperature=?",
+                    key
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, move_uci):
+        """Сохранить легальный ответ LLM (проверка легальности - на вызывающей стороне)"""
+        with self._lock:
+            self._remember(key, move_uci)
+            self.stores += 1
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO moves VALUES (?, ?, ?, ?, ?)", key + (move_uci,))
+                self._db.commit()
+
+    def discard(self, key):
+        """Удалить запись (например, если ход оказался недопустимым)"""
+        with self._lock:
+            self._memory.pop(key, None)
+            if self._db is not None:
+                self._db.execute(
+                    "DELETE FROM moves WHERE model=? AND fen=? AND prompt_version=? AND temperature=?",
+                    key
+                )
+                self._db.commit()
+
+    def stats(self):
+        """Счетчики попаданий и промахов"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": hits / total if total else 0.0,
+                "size": len(self._memory),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key, move_uci):
+        self._memory[key] = move_uci
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
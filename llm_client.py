@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+
+try:
+    from openrouter_config import OPENROUTER_API_KEY
+except ImportError:
+    # Без файла конфигурации ключ берется из окружения; для локального
+    # сервера-заглушки ключ не нужен, но клиент openai требует непустое значение
+    OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY") or "no-key"
+
+OPENROUTER_BASE_URL = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+MAX_CONNECTIONS = 20  # Размер пула HTTP соединений на один клиент
+MAX_RETRIES = 3  # Повторы при 408/409/429/5xx с экспоненциальной задержкой
+RETRY_DELAY_MAX = 8.0  # Максимальная задержка клиента openai перед повтором в секундах
+KEEPALIVE_EXPIRY = 60.0  # Сколько секунд держать простаивающее соединение
+
+_clients = {}
+_clients_lock = threading.Lock()
+_local = threading.local()  # Время получения заголовков ответа в текущем потоке
+
+
+def _on_response(response):
+    """HTTP хук: вызывается после получения заголовков, до чтения тела ответа"""
+    _local.response_started = time.perf_counter()
+
+
+def response_started_at():
+    """Момент (perf_counter) получения первого байта последнего ответа в этом потоке"""
+    started = getattr(_local, "response_started", None)
+    _local.response_started = None
+    return started
+
+
+def get_client(base_url=None, api_key=None, max_connections=MAX_CONNECTIONS, max_retries=MAX_RETRIES):
+    """Общий OpenAI-совместимый клиент с пулом keep-alive соединений
+
+    Клиенты кэшируются по параметрам, поэтому новые партии и новые экземпляры
+    LLMAI используют уже открытые соединения (без повторного TLS рукопожатия).
+    Повторы с экспоненциальной задержкой (с учетом Retry-After) выполняет сам
+    клиент openai при ответах 408/409/429/5xx и сетевых ошибках.
+    Пакет openai импортируется здесь, а не при импорте модуля: это самая
+    долгая часть запуска игры, а окну он до первого запроса не нужен.
+    """
+    base_url = base_url or OPENROUTER_BASE_URL
+    api_key = OPENROUTER_API_KEY if api_key is None else api_key
+    key = (base_url, api_key, max_connections, max_retries)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            import openai
+            try:
+                import httpx2 as httpx  # HTTP транспорт новых версий openai
+            except ImportError:
+                import httpx
+            http_client = openai.DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                event_hooks={"response": [_on_response]},
+            )
+            client = openai.OpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=max_retries,
+                http_client=http_client,
+            )
+            _clients[key] = client
+        return client
+
+
+def is_rate_limit_error(error):
+    """Ошибка API из-за превышения лимита запросов (HTTP 429)"""
+    return getattr(error, "status_code", None) == 429
+
+
+def close_clients():
+    """Закрытие всех клиентов и их пулов соединений"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -1,32 +1,35 @@
 import pygame
 import chess
-import random
-import pickle
 import os
 import sys
-import openai
 import math
-from openrouter_config import OPENROUTER_API_KEY
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from animation import AnimationQueue
+from game_record import GameRecord, PgnArchive, save_pgn
+from history import MoveHistory
+from llm_cache import MoveCache
+from llm_client import (get_client, close_clients, response_started_at, is_rate_limit_error,
+                        MAX_RETRIES, RETRY_DELAY_MAX)
+from metrics import Metrics, NULL_METRICS
+from move_parser import MoveExtractor
+from ponder import Ponderer
+from prompts import FullPrompt
+from providers import ProviderFactory
+from session import Autosaver, Session, SessionArchive, load_session, LOG_MOVE, LOG_FALLBACK
+from sprites import SpriteAtlas
 
-# Инициализация Pygame
-pygame.init()
-
-# Получаем размеры экрана
-info = pygame.display.Info()
-SCREEN_WIDTH = info.current_w
-SCREEN_HEIGHT = info.current_h
-
-# Вычисляем размеры доски для полноэкранного режима
-BOARD_SIZE = min(SCREEN_WIDTH, SCREEN_HEIGHT - 150)  # Оставляем место для информации
-SQUARE_SIZE = BOARD_SIZE // 8
-
-# Центрируем доску на экране
-BOARD_OFFSET_X = (SCREEN_WIDTH - BOARD_SIZE) // 2
-BOARD_OFFSET_Y = (SCREEN_HEIGHT - BOARD_SIZE - 150) // 2
-
-# Создаем полноэкранное окно
-SCREEN = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
-pygame.display.set_caption("Шахматы с LLM ИИ - Полноэкранный режим")
+# Параметры экрана и доски вычисляются в init_display(), чтобы импорт
+# модуля (например, для безголовых матчей) не открывал окно
+SCREEN = None
+SCREEN_WIDTH = 0
+SCREEN_HEIGHT = 0
+BOARD_SIZE = 0
+SQUARE_SIZE = 0
+BOARD_OFFSET_X = 0
+BOARD_OFFSET_Y = 0
 
 # Цвета
 LIGHT_SQUARE = (180, 175, 165)
@@ -34,152 +37,402 @@ DARK_SQUARE = (100, 140, 125)
 HIGHLIGHT_COLOR = (255, 255, 0)
 MOVE_HIGHLIGHT_COLOR = (100, 255, 0, 100) 
 BACKGROUND_COLOR = (40, 40, 40)  
+LAST_MOVE_COLOR = (255, 255, 0, 80)  # Желтый с прозрачностью
 
 # Настройки анимации
-ANIMATION_SPEED = 8  # Скорость анимации (пикселей за кадр)
 ANIMATION_DURATION = 300  # Длительность анимации в миллисекундах
 
-# Загрузка изображений фигур
-PIECES = {}
+# Настройки отрисовки
+FPS = 60
+IDLE_EVENT_TIMEOUT = 100  # Ожидание событий в простое (мс), когда на экране ничего не меняется
+KEY_REPEAT_DELAY = 250  # Удержание клавиши для прокрутки ходов: задержка и интервал повтора (мс)
+KEY_REPEAT_INTERVAL = 25
+# Клавиши просмотра ходов: сдвиг в полуходах
+VIEW_KEYS = {
+    pygame.K_LEFT: -1,
+    pygame.K_RIGHT: 1,
+    pygame.K_UP: -10,
+    pygame.K_DOWN: 10,
+    pygame.K_PAGEUP: -100,
+    pygame.K_PAGEDOWN: 100,
+}
+INFO_PANEL_HEIGHT = 150
+TEXT_CACHE_SIZE = 256  # Максимум отрендеренных строк текста в кэше
+TEXT_COLOR = (255, 255, 255)
+AI_RESPONSE_COLOR = (200, 200, 200)
+
+# Настройки запросов к LLM
+LLM_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct:free"
+LLM_REQUEST_TIMEOUT = 30.0  # Таймаут одного запроса к LLM в секундах
+LLM_GUI_MAX_RETRIES = 1  # Повторы запроса в игре: игрок не ждет все повторы, а получает случайный ход
+LLM_TEMPERATURE = 0.7
+LLM_SAMPLES = 1  # Количество параллельных запросов для голосования за ход
+LLM_QUORUM = 1  # Сколько одинаковых легальных ответов достаточно для выбора хода
+LLM_STREAM = True  # Потоковый ответ: ход принимается, как только он однозначно распознан
+LLM_MAX_TOKENS = 10
+LLM_STREAM_MAX_TOKENS = 32  # В потоковом режиме допускаем лишний текст вокруг хода
+PONDER_ENABLED = True  # Заранее запрашивать ответы LLM на вероятные ходы игрока
+LLM_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.sqlite")
+SAVED_GAMES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_games.pgn")
+# Автосохранение текущей партии после каждого хода и архив сыгранных партий
+AUTOSAVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "autosave.chs")
+SESSIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.chs")
+METRICS_PATH = os.environ.get("CHESS_METRICS")  # JSONL файл метрик LLM (по умолчанию выключены)
+# Источник ходов компьютера (см. providers.py), например "book:book.bin,llm:<модель>,uci:stockfish"
+AI_PLAYER = os.environ.get("CHESS_AI", f"llm:{LLM_MODEL}")
+
+# Изображения фигур (загружаются с диска при первой отрисовке)
 assets_path = os.path.join(os.path.dirname(__file__), "assets")
+SPRITES = SpriteAtlas(assets_path)
 
-for piece in ["bB", "bK", "bN", "bP", "bQ", "bR", "wB", "wK", "wN", "wP", "wQ", "wR"]:
-    PIECES[piece] = pygame.transform.scale(
-        pygame.image.load(os.path.join(assets_path, f"{piece}.png")), 
-        (SQUARE_SIZE, SQUARE_SIZE)
-    )
-
-class AnimatedMove:
-    """Класс для анимации движения фигур"""
-    def __init__(self, piece_surface, start_pos, end_pos, duration=ANIMATION_DURATION):
-        self.piece_surface = piece_surface
-        self.start_pos = start_pos
-        self.end_pos = end_pos
-        self.duration = duration
-        self.start_time = pygame.time.get_ticks()
-        self.is_finished = False
-        
-    def update(self):
-        """Обновление позиции анимации"""
-        current_time = pygame.time.get_ticks()
-        elapsed = current_time - self.start_time
-        
-        if elapsed >= self.duration:
-            self.is_finished = True
-            return self.end_pos
-        
-        # Интерполяция позиции с easing (плавное замедление)
-        progress = elapsed / self.duration
-        # Применяем easing функцию для более плавной анимации
-        eased_progress = 1 - (1 - progress) ** 3  # ease-out cubic
-        
-        x = self.start_pos[0] + (self.end_pos[0] - self.start_pos[0]) * eased_progress
-        y = self.start_pos[1] + (self.end_pos[1] - self.start_pos[1]) * eased_progress
-        
-        return (x, y)
+def init_display():
+    """Инициализация Pygame и полноэкранного окна"""
+    global SCREEN, SCREEN_WIDTH, SCREEN_HEIGHT, BOARD_SIZE, SQUARE_SIZE
+    global BOARD_OFFSET_X, BOARD_OFFSET_Y
+    
+    pygame.init()
+    
+    # Получаем размеры экрана
+    info = pygame.display.Info()
+    SCREEN_WIDTH = info.current_w
+    SCREEN_HEIGHT = info.current_h
+    
+    # Вычисляем размеры доски для полноэкранного режима
+    BOARD_SIZE = min(SCREEN_WIDTH, SCREEN_HEIGHT - INFO_PANEL_HEIGHT)  # Оставляем место для информации
+    SQUARE_SIZE = BOARD_SIZE // 8
+    
+    # Центрируем доску на экране
+    BOARD_OFFSET_X = (SCREEN_WIDTH - BOARD_SIZE) // 2
+    BOARD_OFFSET_Y = (SCREEN_HEIGHT - BOARD_SIZE - INFO_PANEL_HEIGHT) // 2
     
-    def draw(self, screen):
-        """Отрисовка анимированной фигуры"""
-        if not self.is_finished:
-            pos = self.update()
-            screen.blit(self.piece_surface, pos)
+    # Создаем полноэкранное окно
+    SCREEN = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
+    pygame.display.set_caption("Шахматы с LLM ИИ - Полноэкранный режим")
+    pygame.key.set_repeat(KEY_REPEAT_DELAY, KEY_REPEAT_INTERVAL)
 
 class LLMAI:
-    def __init__(self, model_name="meta-llama/llama-4-maverick-17b-128e-instruct:free"):
-        self.client = openai.OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=OPENROUTER_API_KEY,
-        )
+    def __init__(self, model_name=LLM_MODEL,
+                 request_timeout=LLM_REQUEST_TIMEOUT, cache=None,
+                 samples=LLM_SAMPLES, quorum=LLM_QUORUM, client=None, base_url=None,
+                 metrics=NULL_METRICS, stream=LLM_STREAM, prompt=None, rate_limiter=None,
+                 max_retries=MAX_RETRIES):
+        # Клиент общий для всех партий и экземпляров LLMAI (пул соединений);
+        # создается при первом запросе, уже в фоновом потоке
+        self._client = client
+        self.base_url = base_url
         self.model_name = model_name
+        self.request_timeout = request_timeout
+        # Повторы выполняет клиент; у переданного клиента - его собственное число повторов
+        self.max_retries = client.max_retries if client is not None else max_retries
+        self.temperature = LLM_TEMPERATURE
+        self.cache = cache  # MoveCache или None
+        self.samples = max(1, samples)
+        self.quorum = max(1, min(quorum, self.samples))
+        self.metrics = metrics  # Metrics или NULL_METRICS
+        self.stream = stream
+        # Стратегия промпта (см. prompts.py); по умолчанию исходный полный промпт
+        self.prompt = prompt if prompt is not None else FullPrompt()
+        # Общий лимит запросов по модели и ключу (RateLimiter) или None
+        self.rate_limiter = rate_limiter
         self.move_count = 0
+        # Инкрементальная история ходов для промпта
+        self.history = MoveHistory()
+        # Пул для параллельных запросов при голосовании
+        self._sample_pool = None
+        if self.samples > 1:
+            # Запас потоков: непотоковые запросы прошлого хода после кворума дорабатывают
+            self._sample_pool = ThreadPoolExecutor(max_workers=self.samples * 2, thread_name_prefix="llm-sample")
 
-    def get_llm_move(self, board):
-        """Получить ход от языковой модели"""
-        self.move_count += 1
-        
-        # Получаем текущую позицию в FEN формате
-        fen = board.fen()
-        
-        # Получаем историю ходов в PGN формате
-        pgn_moves = []
-        temp_board = chess.Board()
-        
-        # Воссоздаем историю ходов
-        for move in board.move_stack:
-            pgn_moves.append(temp_board.san(move))
-            temp_board.push(move)
-        
-        pgn_history = " ".join(pgn_moves) if pgn_moves else "Начальная позиция"
-        
-        # Получаем список легальных ходов
-        legal_moves = [move.uci() for move in board.legal_moves]
-        legal_moves_str = ", ".join(legal_moves)
-        
-        # Создаем промпт для LLM
-        prompt = f"""Ты играешь в шахматы как {'белые' if board.turn == chess.WHITE else 'черные'}.
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_client(self.base_url, max_retries=self.max_retries)
+        return self._client
 
-Текущая позиция (FEN): {fen}
-История ходов: {pgn_history}
-Ход номер: {self.move_count}
+    @property
+    def deadline(self):
+        """Сколько может длиться запрос хода со всеми повторами клиента (таймаут - на попытку)"""
+        return self.request_timeout * (self.max_retries + 1) + RETRY_DELAY_MAX * self.max_retries
 
-Доступные ходы в UCI формате: {legal_moves_str}
+    def shutdown(self):
+        """Остановка потоков голосования (асинхронные запросы выполняет LLMProvider)"""
+        if self._sample_pool is not None:
+            self._sample_pool.shutdown(wait=False, cancel_futures=True)
 
-Выбери ЛУЧШИЙ ход из доступных и верни ТОЛЬКО UCI код хода (например: e2e4, g1f3, e7e8q).
-Не добавляй никаких объяснений, анализа или дополнительного текста.
-Ответ должен содержать только UCI код хода."""
+    def get_llm_move(self, board, legal_index=None, cancel=None):
+        """Получить ход от языковой модели (legal_index - готовый индекс ходов позиции)
 
-        messages = [
-            {
-                "role": "system", 
-                "content": "Ты шахматный гроссмейстер. Твоя задача - выбрать лучший ход из предложенных вариантов и вернуть только UCI код этого хода."
-            },
-            {
-                "role": "user", 
-                "content": prompt
-            }
-        ]
+        cancel - threading.Event: когда он установлен, потоковый ответ закрывается
+        на следующем фрагменте, а еще не отправленный запрос не отправляется.
+        """
+        self.move_count += 1
+        
+        # Сначала проверяем кэш ответов для этой позиции
+        cache_key = None
+        if self.cache is not None:
+            cache_key = MoveCache.make_key(self.model_name, board, self.prompt.cache_tag, self.temperature)
+            cached_uci = self.cache.get(cache_key)
+            if cached_uci is not None:
+                if self._is_legal_uci(board, cached_uci):
+                    self.metrics.incr("llm.cache_hits")
+                    print(f"Ход #{self.move_count} из кэша: '{cached_uci}'")
+                    return cached_uci
+                self.cache.discard(cache_key)
+            self.metrics.incr("llm.cache_misses")
+        
+        with self.metrics.timer("llm.prompt_build_seconds"):
+            # Получаем историю ходов и легальные ходы (досчитываются только новые ходы)
+            pgn_history, legal_index = self.history.snapshot(board, legal_index, self.prompt.history_window)
+            messages = self.prompt.build(board, pgn_history, legal_index)
+        if self.samples > 1:
+            move_uci = self._vote(messages, legal_index, cancel)
+        else:
+            move_uci = self._ask(messages, legal_index, cancel)
+        
+        if move_uci is not None and cache_key is not None:
+            self.cache.put(cache_key, move_uci)
+        return move_uci
 
+    def _ask(self, messages, legal_index, cancel=None):
+        """Один запрос к LLM: легальный UCI код или None"""
+        metrics = self.metrics
+        if cancel is not None and cancel.is_set():
+            return None
+        if self.rate_limiter is not None:
+            waited = self.rate_limiter.acquire(self.model_name, self.client.api_key)
+            if waited:
+                metrics.observe("llm.rate_limit_wait_seconds", waited)
+        metrics.incr("llm.requests")
+        started = time.perf_counter()
         try:
             print(f"Запрос к LLM для хода #{self.move_count}...")
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=10
-            )
-            
-            move_uci = response.choices[0].message.content.strip()
-            print(f"LLM ответил: '{move_uci}'")
+            if self.stream:
+                answer, move, first_byte, usage = self._request_stream(messages, legal_index, cancel)
+            else:
+                answer, move, first_byte, usage = self._request(messages, legal_index)
+            received = time.perf_counter()
+            if move is None and cancel is not None and cancel.is_set():
+                metrics.incr("llm.cancelled")
+                return None
+            print(f"LLM ответил: '{answer}'")
             
-            # Проверяем, что ответ содержит только UCI код
-            if move_uci in legal_moves:
-                return move_uci
+            # Ход ищется в ответе, даже если вокруг него есть лишний текст
+            legal = move is not None
+            if metrics.enabled:
+                self._record_request(started, received, first_byte, usage, answer, legal)
+            if legal:
+                return move.uci()
             else:
-                print(f"LLM предложил недопустимый ход: {move_uci}")
-                print(f"Доступные ходы: {legal_moves_str}")
+                print(f"LLM предложил недопустимый ход: {answer}")
                 return None
                 
         except Exception as e:
+            if is_rate_limit_error(e) and self.rate_limiter is not None:
+                # Повторы клиента не помогли - притормаживаем все партии с этой моделью
+                self.rate_limiter.penalize(self.model_name, self.client.api_key)
+            metrics.incr("llm.errors")
+            metrics.record("llm_error", model=self.model_name, error=str(e),
+                           wall_seconds=time.perf_counter() - started)
             print(f"Ошибка при запросе к LLM: {e}")
             return None
 
+    def _request(self, messages, legal_index):
+        """Обычный запрос: (текст ответа, ход или None, время первого байта, usage)"""
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=LLM_MAX_TOKENS,
+            timeout=self.request_timeout
+        )
+        answer = (response.choices[0].message.content or "").strip()
+        move = MoveExtractor.parse(answer, legal_index)
+        return answer, move, response_started_at(), getattr(response, "usage", None)
+
+    def _request_stream(self, messages, legal_index, cancel=None):
+        """Потоковый запрос: поток закрывается, как только ход распознан или запрос отменен"""
+        # Для метрик токены приходят последним фрагментом потока (без choices)
+        options = {"stream_options": {"include_usage": True}} if self.metrics.enabled else {}
+        stream = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=LLM_STREAM_MAX_TOKENS,
+            timeout=self.request_timeout,
+            stream=True,
+            **options
+        )
+        extractor = MoveExtractor(legal_index)
+        first_chunk = None
+        move = None
+        usage = None
+        finished = False
+        try:
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    # Ответ больше не нужен (кворум набран, игрок не дождался) - закрываем поток
+                    finished = True
+                    break
+                if first_chunk is None:
+                    first_chunk = time.perf_counter()
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                move = extractor.feed(chunk.choices[0].delta.content or "")
+                if move is not None:
+                    break
+            else:
+                move = extractor.finish()
+                finished = True
+        except BaseException:
+            # Ошибка чтения потока - соединение возвращается в пул, дочитывать нечего
+            stream.close()
+            raise
+        if finished or not self.metrics.enabled:
+            stream.close()
+        else:
+            # Ход уже распознан: остаток потока (до LLM_STREAM_MAX_TOKENS) дочитывается
+            # в фоне ради usage, чтобы не задерживать ход
+            threading.Thread(target=self._drain_usage, args=(stream,), daemon=True).start()
+        return extractor.text.strip(), move, first_chunk, usage
+
+    def _drain_usage(self, stream):
+        """Дочитать поток после распознанного хода и учесть токены из usage"""
+        usage = None
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+        except Exception:
+            pass  # Соединение закрыто (выход из игры) - токены этого запроса не учитываются
+        finally:
+            stream.close()
+        if usage is not None:
+            self.metrics.incr("llm.prompt_tokens", usage.prompt_tokens or 0)
+            self.metrics.incr("llm.completion_tokens", usage.completion_tokens or 0)
+
+    def _record_request(self, started, received, first_byte, usage, answer, legal):
+        """Метрики одного запроса: время, время до первого байта, токены, легальность"""
+        metrics = self.metrics
+        wall = received - started
+        ttfb = first_byte - started if first_byte is not None else None
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        
+        metrics.observe("llm.request_seconds", wall)
+        if ttfb is not None:
+            metrics.observe("llm.ttfb_seconds", ttfb)
+        if prompt_tokens is not None:
+            metrics.incr("llm.prompt_tokens", prompt_tokens)
+        if completion_tokens is not None:
+            metrics.incr("llm.completion_tokens", completion_tokens)
+        metrics.incr("llm.legal_answers" if legal else "llm.illegal_answers")
+        metrics.record("llm_request", model=self.model_name, move_number=self.move_count,
+                       wall_seconds=wall, ttfb_seconds=ttfb, prompt_tokens=prompt_tokens,
+                       completion_tokens=completion_tokens, answer=answer, legal=legal)
+
+    def _vote(self, messages, legal_index, cancel=None):
+        """Параллельные запросы с досрочной остановкой при наборе кворума"""
+        # После выбора хода оставшиеся запросы прерываются: неотправленные не уходят,
+        # потоковые закрываются на следующем фрагменте
+        stop = cancel if cancel is not None else threading.Event()
+        futures = [self._sample_pool.submit(self._ask, messages, legal_index, stop) for _ in range(self.samples)]
+        votes = Counter()
+        try:
+            for future in as_completed(futures):
+                move_uci = future.result()
+                if move_uci is None:
+                    continue
+                votes[move_uci] += 1
+                if votes[move_uci] >= self.quorum:
+                    return move_uci
+        finally:
+            stop.set()
+            for future in futures:
+                future.cancel()
+        
+        # Кворум не набран - берем самый частый легальный ответ
+        if votes:
+            return votes.most_common(1)[0][0]
+        return None
+
+    @staticmethod
+    def _is_legal_uci(board, move_uci):
+        """Проверка, что строка - легальный ход в UCI формате"""
+        try:
+            return board.is_legal(chess.Move.from_uci(move_uci))
+        except ValueError:
+            return False
+
 class ChessBoardGUI:
-    def __init__(self):
+    def __init__(self, pgn_path=None):
+        if SCREEN is None:
+            init_display()
         self.board = chess.Board()
-        self.llm_ai = LLMAI()
+        self.llm_cache = MoveCache(LLM_CACHE_PATH)
+        self.metrics = Metrics(METRICS_PATH) if METRICS_PATH else NULL_METRICS
+        # Источник ходов компьютера: LLM, движок, книга или их комбинация
+        self.ai_factory = ProviderFactory(AI_PLAYER, llm_factory=self.create_llm_ai, metrics=self.metrics)
+        self.ai = self.ai_factory.create()
+        # Обдумывать заранее имеет смысл только медленные (сетевые) источники
+        self.ponderer = Ponderer(self.ai) if PONDER_ENABLED and not self.ai.local else None
         self.selected_square = None
         self.is_player_turn = True
-        self.move_history = []
+        self.move_history = MoveHistory()
+        # Полная запись партии для просмотра ходов и сохранения в PGN
+        self.record = GameRecord()
+        self.view_ply = None  # Просматриваемый полуход (None - текущая позиция)
+        self.view_board = None  # Позиция просматриваемого полухода (строится при отрисовке)
+        self.archive = None  # Открытый PGN файл (PgnArchive) в режиме анализа
+        self.saved_record = None  # (запись, полуходов) последней партии, сохраненной по S
+        self.archive_index = 0
+        self.ai_log = []  # Журнал ходов ИИ: (полуход, время ответа в мс, тип, текст)
+        self.autosaver = Autosaver(AUTOSAVE_PATH)
         self.clock = pygame.time.Clock()
         self.thinking = False
         self.last_ai_response = ""
         self.possible_moves_highlight = []
         
-        # Анимация
-        self.current_animation = None
-        self.animation_in_progress = False
+        # Текущий асинхронный запрос к LLM
+        self.pending_ai_move = None
+        self.pending_ai_started = 0
+        self.pending_from_ponder = False  # Ожидаемый ход запрошен заранее (Ponderer)
+        
+        # Анимация: очередь ходов, которую продвигает время кадра
+        self.animations = AnimationQueue(ANIMATION_DURATION)
+        self.frame_dt = 0  # Время предыдущего кадра из clock.tick (мс)
+        self.animation_shown = False
         self.last_move_squares = None  # Для подсветки последнего хода
         
+        # Отрисовка только измененных областей экрана
+        self.dirty_rects = []
+        self.full_redraw = True
+        self.render_square_size = None  # Размер клетки, для которого построен кэш отрисовки
+        self.board_surface = None
+        self.pieces = None  # Изображения фигур для текущего размера клетки
+        self.last_move_overlay = None
+        self.move_dot_overlay = None
+        self.board_rect = None
+        self.info_rect = None
+        self.font = None
+        self.font_size = None
+        self.text_cache = {}
+        self.build_render_cache()
+        
+        # Статус партии пересчитывается один раз за ход, а не каждый кадр
+        self.game_over = False
+        self.game_status_text = None
+        self.update_game_status()
+        self.resume_session()
+        if pgn_path is not None:
+            # python main.py партии.pgn - режим анализа, фоновые запросы к LLM не нужны
+            self.open_archive(pgn_path)
+        if self.archive is None:
+            self.start_pondering()
+        
+    def create_llm_ai(self, model_name):
+        """Новый LLMAI для партии (кэш ответов и метрики общие)"""
+        return LLMAI(model_name, cache=self.llm_cache, metrics=self.metrics, max_retries=LLM_GUI_MAX_RETRIES)
+
     def square_to_pixel(self, square):
         """Преобразование квадрата доски в пиксельные координаты"""
         col = chess.square_file(square)
@@ -198,199 +451,471 @@ class ChessBoardGUI:
         row = (y - BOARD_OFFSET_Y) // SQUARE_SIZE
         return chess.square(col, 7 - row)
     
-    def animate_move(self, move):
-        """Запуск анимации хода"""
-        if self.animation_in_progress:
-            return
-            
-        # Получаем фигуру, которая двигается
-        piece = self.board.piece_at(move.from_square)
-        if piece is None:
-            return
-            
-        # Получаем изображение фигуры
-        piece_char = piece.symbol()
-        if piece_char.isupper():
-            piece_name = "w" + piece_char.upper()
+    def square_rect(self, square):
+        """Прямоугольник клетки на экране"""
+        return pygame.Rect(self.square_to_pixel(square), (SQUARE_SIZE, SQUARE_SIZE))
+
+    def mark_dirty(self, rect=None):
+        """Пометить область для перерисовки (None - весь экран)"""
+        if rect is None:
+            self.full_redraw = True
         else:
-            piece_name = "b" + piece_char.upper()
+            self.dirty_rects.append(rect)
+
+    def build_render_cache(self):
+        """Предварительная отрисовка доски и подсветок для текущего разрешения"""
+        self.render_square_size = SQUARE_SIZE
+        self.board_rect = pygame.Rect(BOARD_OFFSET_X, BOARD_OFFSET_Y, BOARD_SIZE, BOARD_SIZE)
+        info_top = BOARD_OFFSET_Y + BOARD_SIZE
+        self.info_rect = pygame.Rect(0, info_top, SCREEN_WIDTH, SCREEN_HEIGHT - info_top)
         
-        piece_surface = PIECES[piece_name]
+        self.board_surface = pygame.Surface((SQUARE_SIZE * 8, SQUARE_SIZE * 8)).convert()
+        for row in range(8):
+            for col in range(8):
+                color = LIGHT_SQUARE if (row + col) % 2 == 0 else DARK_SQUARE
+                rect = pygame.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+                pygame.draw.rect(self.board_surface, color, rect)
         
-        # Получаем начальную и конечную позиции
-        start_pos = self.square_to_pixel(move.from_square)
-        end_pos = self.square_to_pixel(move.to_square)
+        self.last_move_overlay = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
+        self.last_move_overlay.fill(LAST_MOVE_COLOR)
         
-        # Создаем анимацию
-        self.current_animation = AnimatedMove(piece_surface, start_pos, end_pos)
-        self.animation_in_progress = True
+        self.move_dot_overlay = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
+        pygame.draw.circle(self.move_dot_overlay, MOVE_HIGHLIGHT_COLOR, (SQUARE_SIZE // 2, SQUARE_SIZE // 2), SQUARE_SIZE // 4)
         
-        # Сохраняем квадраты для подсветки последнего хода
+        self.pieces = SPRITES.sprites(SQUARE_SIZE)
+        
+        # Шрифт загружается один раз на разрешение
+        self.font_size = max(24, SCREEN_HEIGHT // 40)
+        self.font = pygame.font.Font(None, self.font_size)
+        self.text_cache = {}
+        self.full_redraw = True
+
+    def render_text(self, text, color):
+        """Отрендеренная строка текста из кэша (ключ - строка, цвет, размер)"""
+        key = (text, color, self.font_size)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) >= TEXT_CACHE_SIZE:
+                self.text_cache.clear()
+            surface = self.font.render(text, True, color)
+            self.text_cache[key] = surface
+        return surface
+
+    def update_game_status(self):
+        """Пересчет статуса окончания партии (вызывается после каждого хода)"""
+        self.game_over = self.board.is_game_over()
+        if not self.game_over:
+            self.game_status_text = None
+            return
+        
+        result = self.board.result()
+        if result == "1-0":
+            self.game_status_text = "Игра окончена: Белые победили (Мат)!"
+        elif result == "0-1":
+            self.game_status_text = "Игра окончена: Черные победили (Мат)!"
+        elif result == "1/2-1/2":
+            if self.board.is_stalemate():
+                self.game_status_text = "Игра окончена: Пат (Ничья)!"
+            elif self.board.is_insufficient_material():
+                self.game_status_text = "Игра окончена: Недостаточно материала (Ничья)!"
+            elif self.board.is_fivefold_repetition():
+                self.game_status_text = "Игра окончена: Пятикратное повторение (Ничья)!"
+            elif self.board.is_seventyfive_moves():
+                self.game_status_text = "Игра окончена: Правило 75 ходов (Ничья)!"
+            else:
+                self.game_status_text = "Игра окончена: Ничья!"
+        else:
+            self.game_status_text = "Игра окончена: Неизвестный результат."
+
+    def set_selection(self, square):
+        """Выбор клетки (None - снять выбор) с пометкой измененных клеток"""
+        for old_square in [self.selected_square] + self.possible_moves_highlight:
+            if old_square is not None:
+                self.mark_dirty(self.square_rect(old_square))
+        
+        self.selected_square = square
+        if square is None:
+            self.possible_moves_highlight = []
+        else:
+            self.possible_moves_highlight = self.move_history.legal_index().destinations(square)
+        
+        for new_square in [self.selected_square] + self.possible_moves_highlight:
+            if new_square is not None:
+                self.mark_dirty(self.square_rect(new_square))
+
+    def push_move(self, move):
+        """Выполнение хода на доске с анимацией"""
+        # Анимация ставится в очередь по позиции до хода, сам ход выполняется сразу
+        self.animations.push(self.board, move)
         self.last_move_squares = (move.from_square, move.to_square)
+        self.board.push(move)
+        self.move_history.push(move)
+        self.record.append(move, self.move_history.san_moves[-1])
+        self.update_game_status()
+        if self.game_over:
+            self.archive_game()
+        else:
+            self.autosave()
+        # Рокировка и взятие на проходе меняют несколько клеток - перерисовываем доску
+        self.mark_dirty(self.board_rect)
+        self.mark_dirty(self.info_rect)
+
+    def animation_rect(self, animation):
+        """Область экрана, которую затрагивает анимация хода"""
+        rects = [self.square_rect(square) for square in animation.squares]
+        return rects[0].unionall(rects[1:])
+
+    def advance_animations(self, dt):
+        """Продвижение анимаций на dt мс и пометка измененных областей"""
+        for animation in self.animations.update(dt):
+            self.mark_dirty(self.animation_rect(animation))
+        if self.animations:
+            self.mark_dirty(self.animation_rect(self.animations.active))
+        elif self.animation_shown:
+            # Последняя анимация закончилась: подсветка хода и статус
+            self.mark_dirty(self.info_rect)
+        self.animation_shown = bool(self.animations)
+
+    def set_view(self, ply):
+        """Просмотр позиции после ply полуходов (последний полуход - текущая позиция)"""
+        ply = max(0, min(ply, len(self.record)))
+        if ply == len(self.record) and self.archive is None:
+            ply = None
+        if ply == self.view_ply:
+            return
+        self.view_ply = ply
+        # Позиция строится один раз при отрисовке, даже если за кадр пришло много нажатий
+        self.view_board = None
+        self.set_selection(None)
+        self.mark_dirty(self.board_rect)
+        self.mark_dirty(self.info_rect)
+
+    def step_view(self, delta):
+        current = self.view_ply if self.view_ply is not None else len(self.record)
+        self.set_view(current + delta)
+
+    def open_archive(self, path):
+        """Режим анализа: просмотр партий из PGN файла"""
+        archive = PgnArchive(path)
+        if not len(archive):
+            archive.close()
+            print(f"В файле {path} нет партий")
+            return
+        # Незаконченная партия остается в автосохранении и продолжится при следующем запуске;
+        # копия в архиве партий сохранится, даже если из анализа начать новую партию
+        if self.record and not self.game_over:
+            self.autosave()
+            self.archive_game(keep_autosave=True)
+        self.reset_game(ponder=False)
+        self.archive = archive
+        print(f"Открыт архив {path}: {len(archive)} партий")
+        self.show_archive_game(0)
+
+    def show_archive_game(self, index):
+        """Загрузка партии архива с начальной позиции"""
+        self.archive_index = max(0, min(index, len(self.archive) - 1))
+        try:
+            record = self.archive[self.archive_index]
+        except ValueError as e:
+            # Поврежденная партия: на доске остается прежняя, по [ и ] можно идти дальше
+            self.last_ai_response = f"Партия {self.archive_index + 1} повреждена: {e}"
+            print(self.last_ai_response)
+            self.mark_dirty(self.info_rect)
+            return
+        self.record = record
+        self.last_ai_response = ""
+        self.board = self.record.board()
+        self.move_history.sync(self.board)
+        self.last_move_squares = None
+        self.update_game_status()
+        self.view_ply = None
+        self.set_view(0)
+
+    def save_game(self):
+        """Дописать текущую партию в PGN файл"""
+        if not self.record:
+            return
+        if self.saved_record == (self.record, len(self.record)):
+            self.last_ai_response = "Партия уже сохранена"
+            self.mark_dirty(self.info_rect)
+            return
+        self.record.headers.setdefault("Event", "Шахматы с LLM ИИ")
+        self.record.headers.setdefault("Date", time.strftime("%Y.%m.%d"))
+        self.record.headers.setdefault("White", "Игрок")
+        self.record.headers.setdefault("Black", self.ai.name)
+        save_pgn(SAVED_GAMES_PATH, [self.record], append=True)
+        self.saved_record = (self.record, len(self.record))
+        self.last_ai_response = f"Партия сохранена в {os.path.basename(SAVED_GAMES_PATH)}"
+        self.mark_dirty(self.info_rect)
+
+    def session(self):
+        """Текущая партия и состояние интерфейса для сохранения"""
+        start_fen = self.record.start_board.fen()
+        return Session(
+            moves=self.record.moves,
+            start_fen=None if start_fen == chess.STARTING_FEN else start_fen,
+            headers=self.record.headers,
+            ai_log=self.ai_log,
+            view_ply=self.view_ply,
+            last_ai_response=self.last_ai_response,
+            result=self.record.result(),
+        )
+
+    def autosave(self):
+        """Сохранение партии в фоне (партии из PGN архива не сохраняются)"""
+        if self.archive is None:
+            self.autosaver.save(self.session())
+
+    def resume_session(self):
+        """Продолжение незаконченной партии из автосохранения"""
+        session = load_session(AUTOSAVE_PATH)
+        if session is None or not session.moves:
+            return
+        board = session.board()
+        if board.is_game_over():
+            return
+        self.board = board
+        self.move_history.sync(board)
+        self.record = GameRecord(chess.Board(session.start_fen) if session.start_fen else None, session.headers)
+        self.record.extend(session.moves)
+        self.ai_log = session.ai_log
+        self.last_ai_response = session.last_ai_response
+        self.last_move_squares = (board.peek().from_square, board.peek().to_square)
+        self.is_player_turn = board.turn == chess.WHITE
+        self.update_game_status()
+        self.set_view(session.view_ply if session.view_ply is not None else len(self.record))
+        self.mark_dirty()
+        print(f"Продолжаем сохраненную партию ({len(session.moves)} полуходов)")
+
+    def archive_game(self, keep_autosave=False):
+        """Текущая партия - в архив сыгранных партий (автосохранение обычно больше не нужно)"""
+        if self.archive is not None or not self.record:
+            return
+        try:
+            SessionArchive(SESSIONS_PATH).append(self.session())
+        except OSError as e:
+            print(f"Не удалось сохранить партию в архив: {e}")
+        if not keep_autosave:
+            self.autosaver.clear()
+
+    def new_game(self):
+        """Новая партия (и выход из режима анализа)"""
+        # Законченная партия уже в архиве, незаконченная сохраняется сейчас
+        if not self.game_over:
+            self.archive_game()
+        self.reset_game()
+
+    def reset_game(self, ponder=True):
+        """Начальная позиция и новый источник ходов (без архивации текущей партии)"""
+        self.cancel_ai_move()
+        self.ai.close()
+        self.board = chess.Board()
+        self.ai = self.ai_factory.create()
+        if self.ponderer is not None:
+            self.ponderer.reset(self.ai)
+        self.selected_square = None
+        self.is_player_turn = True
+        self.move_history = MoveHistory()
+        self.record = GameRecord()
+        self.ai_log = []
+        self.view_ply = None
+        self.view_board = None
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+        self.thinking = False
+        self.last_ai_response = ""
+        self.possible_moves_highlight = []
+        self.animations.clear()
+        self.last_move_squares = None
+        self.update_game_status()
+        if ponder:
+            self.start_pondering()
+        self.mark_dirty()
 
     def get_ai_move(self):
-        """Получить ход от LLM ИИ"""
-        if not self.board.is_game_over():
-            self.thinking = True
-            move_uci = self.llm_ai.get_llm_move(self.board)
-            
-            if move_uci:
-                try:
-                    move = chess.Move.from_uci(move_uci)
-                    if move in self.board.legal_moves:
-                        # Запускаем анимацию перед выполнением хода
-                        self.animate_move(move)
-                        self.board.push(move)
-                        self.move_history.append(move.uci())
-                        self.last_ai_response = f"LLM сделал ход: {move.uci()}"
-                        print(self.last_ai_response)
-                    else:
-                        # Fallback к случайному ходу
-                        move = random.choice(list(self.board.legal_moves))
-                        self.animate_move(move)
-                        self.board.push(move)
-                        self.move_history.append(move.uci())
-                        self.last_ai_response = f"LLM ошибся, случайный ход: {move.uci()}"
-                        print(self.last_ai_response)
-                except ValueError:
-                    # Fallback к случайному ходу
-                    move = random.choice(list(self.board.legal_moves))
-                    self.animate_move(move)
-                    self.board.push(move)
-                    self.move_history.append(move.uci())
-                    self.last_ai_response = f"LLM дал некорректный ответ, случайный ход: {move.uci()}"
-                    print(self.last_ai_response)
-            else:
-                # Fallback к случайному ходу
-                move = random.choice(list(self.board.legal_moves))
-                self.animate_move(move)
-                self.board.push(move)
-                self.move_history.append(move.uci())
-                self.last_ai_response = f"LLM не ответил, случайный ход: {move.uci()}"
-                print(self.last_ai_response)
-            
-            self.thinking = False
+        """Запуск асинхронного запроса хода у LLM ИИ"""
+        if self.game_over:
+            self.is_player_turn = True
+            return
+        self.thinking = True
+        self.mark_dirty(self.info_rect)
+        # Сначала проверяем ответы, запрошенные заранее, пока думал игрок
+        future = self.ponderer.take(self.board) if self.ponderer else None
+        self.pending_from_ponder = future is not None
+        if future is not None:
+            print("Используем ответ LLM, запрошенный заранее")
+        else:
+            future = self.ai.request_move(self.board, self.move_history.legal_index())
+        self.pending_ai_move = future
+        self.pending_ai_started = time.monotonic()
+
+    def start_pondering(self):
+        """Фоновые запросы к LLM на вероятные ходы игрока"""
+        if self.ponderer is not None and self.is_player_turn and not self.game_over and self.archive is None:
+            self.ponderer.start(self.board)
+
+    def poll_ai_move(self):
+        """Проверка готовности хода LLM (вызывается каждый кадр)"""
+        future = self.pending_ai_move
+        if future is None:
+            return
+        
+        if future.done():
+            self.pending_ai_move = None
+            try:
+                move = future.result()
+            except Exception as e:
+                print(f"Ошибка при запросе к LLM: {e}")
+                move = None
+            if self.pending_from_ponder:
+                self.pending_from_ponder = False
+                self.ponderer.settle(move is not None)
+                self.metrics.incr("ponder.hits" if move is not None else "ponder.misses")
+                if move is None:
+                    # Заранее запрошенный ответ ничего не дал - запрашиваем ход как обычно
+                    self.pending_ai_move = self.ai.request_move(self.board, self.move_history.legal_index())
+                    self.pending_ai_started = time.monotonic()
+                    return
+            self.apply_ai_move(move)
+        elif time.monotonic() - self.pending_ai_started > self.ai.timeout:
+            # Ответ не пришел вовремя (с учетом повторов) - прерываем запрос,
+            # чтобы он не занимал поток источника ходов
+            future.cancel()
+            self.abort_ai_requests()
+            self.pending_ai_move = None
+            self.apply_ai_move(None, "не успел ответить")
+
+    def cancel_ai_move(self):
+        """Отмена текущего запроса к LLM"""
+        if self.pending_ai_move is not None:
+            self.pending_ai_move.cancel()
+            self.abort_ai_requests()
+            self.pending_ai_move = None
+        self.thinking = False
+        self.mark_dirty(self.info_rect)
+
+    def abort_ai_requests(self):
+        """Прервать запрос ожидаемого хода (обычный или взятый у Ponderer)"""
+        if self.pending_from_ponder:
+            self.ponderer.cancel()
+            self.pending_from_ponder = False
+        else:
+            self.ai.abort()
+
+    def apply_ai_move(self, move, fallback_reason="не ответил"):
+        """Выполнение хода компьютера или случайного хода при ошибке"""
+        self.metrics.incr("moves.ai")
+        legal_index = self.move_history.legal_index()
+        if move is not None and move not in legal_index:
+            move = None
+            fallback_reason = "ошибся"
+        
+        if move is not None:
+            # Имя источника, который дал ход (у составного - сработавшего)
+            source = self.ai.last_source or self.ai.name
+            self.last_ai_response = f"{source} сделал ход: {move.uci()}"
+            kind = LOG_MOVE
+        else:
+            # Fallback к случайному ходу
+            move = legal_index.random_move()
+            self.metrics.incr("moves.fallback")
+            self.last_ai_response = f"{self.ai.name} {fallback_reason}, случайный ход: {move.uci()}"
+            kind = LOG_FALLBACK
+        think_ms = int((time.monotonic() - self.pending_ai_started) * 1000)
+        self.ai_log.append((len(self.record), think_ms, kind, self.last_ai_response))
+        
+        self.push_move(move)
+        print(self.last_ai_response)
+        
+        self.thinking = False
         self.is_player_turn = True
+        self.start_pondering()
 
     def draw_board(self):
         """Отрисовка шахматной доски"""
-        for row in range(8):
-            for col in range(8):
-                color = LIGHT_SQUARE if (row + col) % 2 == 0 else DARK_SQUARE
-                rect = pygame.Rect(
-                    BOARD_OFFSET_X + col * SQUARE_SIZE, 
-                    BOARD_OFFSET_Y + row * SQUARE_SIZE, 
-                    SQUARE_SIZE, 
-                    SQUARE_SIZE
-                )
-                pygame.draw.rect(SCREEN, color, rect)
+        SCREEN.blit(self.board_surface, (BOARD_OFFSET_X, BOARD_OFFSET_Y))
 
         # Подсветка последнего хода
-        if self.last_move_squares and not self.animation_in_progress:
-            for square in self.last_move_squares:
-                col = chess.square_file(square)
-                row = 7 - chess.square_rank(square)
-                # Создаем полупрозрачную поверхность для подсветки
-                highlight_surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-                highlight_surface.fill((255, 255, 0, 80))  # Желтый с прозрачностью
-                SCREEN.blit(highlight_surface, (BOARD_OFFSET_X + col * SQUARE_SIZE, BOARD_OFFSET_Y + row * SQUARE_SIZE))
+        last_move_squares = self.last_move_squares
+        if self.view_ply is not None:
+            move = self.record.moves[self.view_ply - 1] if self.view_ply else None
+            last_move_squares = (move.from_square, move.to_square) if move else None
+        elif self.animations:
+            last_move_squares = None
+        if last_move_squares:
+            for square in last_move_squares:
+                SCREEN.blit(self.last_move_overlay, self.square_to_pixel(square))
 
         # Подсветка выбранной клетки
         if self.selected_square is not None:
-            col = chess.square_file(self.selected_square)
-            row = 7 - chess.square_rank(self.selected_square)
-            rect = pygame.Rect(
-                BOARD_OFFSET_X + col * SQUARE_SIZE, 
-                BOARD_OFFSET_Y + row * SQUARE_SIZE, 
-                SQUARE_SIZE, 
-                SQUARE_SIZE
-            )
-            pygame.draw.rect(SCREEN, HIGHLIGHT_COLOR, rect, 3)
+            pygame.draw.rect(SCREEN, HIGHLIGHT_COLOR, self.square_rect(self.selected_square), 3)
 
         # Подсветка возможных ходов
         for square in self.possible_moves_highlight:
-            col = chess.square_file(square)
-            row = 7 - chess.square_rank(square)
-            highlight_surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-            pygame.draw.circle(highlight_surface, MOVE_HIGHLIGHT_COLOR, (SQUARE_SIZE // 2, SQUARE_SIZE // 2), SQUARE_SIZE // 4)
-            SCREEN.blit(highlight_surface, (BOARD_OFFSET_X + col * SQUARE_SIZE, BOARD_OFFSET_Y + row * SQUARE_SIZE))
+            SCREEN.blit(self.move_dot_overlay, self.square_to_pixel(square))
 
     def draw_pieces(self):
         """Отрисовка фигур на доске"""
-        for row in range(8):
-            for col in range(8):
-                square = chess.square(col, 7 - row)
-                piece = self.board.piece_at(square)
-                
-                # Не рисуем фигуру, если она участвует в анимации
-                if (self.animation_in_progress and self.current_animation and 
-                    self.last_move_squares and square in self.last_move_squares):
-                    continue
-                
-                if piece:
-                    piece_char = piece.symbol()
-                    if piece_char.isupper():
-                        piece_name = "w" + piece_char.upper()
-                    else:
-                        piece_name = "b" + piece_char.upper()
-                    SCREEN.blit(PIECES[piece_name], (BOARD_OFFSET_X + col * SQUARE_SIZE, BOARD_OFFSET_Y + row * SQUARE_SIZE))
+        if self.view_ply is not None:
+            if self.view_board is None:
+                self.view_board = self.record.board_at(self.view_ply)
+            for square, piece in self.view_board.piece_map().items():
+                SCREEN.blit(self.pieces[piece.symbol()], self.square_to_pixel(square))
+            return
+        animation = self.animations.active
+        if animation is not None:
+            # Во время анимации показываем позицию до хода без движущихся фигур
+            for square, symbol in animation.static.items():
+                SCREEN.blit(self.pieces[symbol], self.square_to_pixel(square))
+        else:
+            for square, piece in self.board.piece_map().items():
+                SCREEN.blit(self.pieces[piece.symbol()], self.square_to_pixel(square))
 
     def draw_animation(self):
-        """Отрисовка анимации"""
-        if self.current_animation and self.animation_in_progress:
-            self.current_animation.draw(SCREEN)
-            
-            # Проверяем, завершилась ли анимация
-            if self.current_animation.is_finished:
-                self.animation_in_progress = False
-                self.current_animation = None
+        """Отрисовка движущихся фигур текущей анимации"""
+        animation = self.animations.active
+        if animation is not None and self.view_ply is None:
+            for symbol, pos in animation.positions(self.animations.duration, self.square_to_pixel):
+                SCREEN.blit(self.pieces[symbol], pos)
 
     def draw_info(self):
         """Отрисовка информационной панели"""
-        font_size = max(24, SCREEN_HEIGHT // 40)
-        font = pygame.font.Font(None, font_size)
-        
         info_y = BOARD_OFFSET_Y + BOARD_SIZE + 20
         
         # Информация о ходе
         if self.thinking:
             turn_text = "LLM ИИ думает..."
-        elif self.animation_in_progress:
+        elif self.animations:
             turn_text = "Анимация хода..."
-        elif self.board.is_game_over():
-            result = self.board.result()
-            if result == "1-0":
-                turn_text = "Игра окончена: Белые победили (Мат)!"
-            elif result == "0-1":
-                turn_text = "Игра окончена: Черные победили (Мат)!"
-            elif result == "1/2-1/2":
-                if self.board.is_stalemate():
-                    turn_text = "Игра окончена: Пат (Ничья)!"
-                elif self.board.is_insufficient_material():
-                    turn_text = "Игра окончена: Недостаточно материала (Ничья)!"
-                elif self.board.is_fivefold_repetition():
-                    turn_text = "Игра окончена: Пятикратное повторение (Ничья)!"
-                elif self.board.is_seventyfive_moves():
-                    turn_text = "Игра окончена: Правило 75 ходов (Ничья)!"
-                else:
-                    turn_text = "Игра окончена: Ничья!"
-            else:
-                turn_text = "Игра окончена: Неизвестный результат."
+        elif self.game_over:
+            turn_text = self.game_status_text
         elif self.board.turn == chess.WHITE:
             turn_text = "Ход белых (игрок)"
         else:
             turn_text = "Ход черных (LLM ИИ)"
         
-        if not self.is_player_turn and not self.thinking and not self.animation_in_progress and not self.board.is_game_over():
+        if not self.is_player_turn and not self.thinking and not self.animations and not self.game_over:
             turn_text = "Ход LLM ИИ"
         
-        text_surface = font.render(turn_text, True, (255, 255, 255))
+        if self.view_ply is not None:
+            turn_text = f"Просмотр: полуход {self.view_ply} из {len(self.record)}"
+            if self.archive is not None:
+                headers = self.record.headers
+                turn_text = (f"Партия {self.archive_index + 1} из {len(self.archive)} "
+                             f"({headers.get('White', '?')} - {headers.get('Black', '?')}), {turn_text.lower()}")
+        
+        text_surface = self.render_text(turn_text, TEXT_COLOR)
         SCREEN.blit(text_surface, (BOARD_OFFSET_X, info_y))
         
         # Последний ход
-        if self.move_history:
+        if self.view_ply:
+            last_move = f"Ход: {self.record.san_moves[self.view_ply - 1]}"
+            text_surface = self.render_text(last_move, TEXT_COLOR)
+            SCREEN.blit(text_surface, (BOARD_OFFSET_X, info_y + 30))
+        elif self.move_history and self.view_ply is None:
             last_move = f"Последний ход: {self.move_history[-1]}"
-            text_surface = font.render(last_move, True, (255, 255, 255))
+            text_surface = self.render_text(last_move, TEXT_COLOR)
             SCREEN.blit(text_surface, (BOARD_OFFSET_X, info_y + 30))
         
         # Последний ответ ИИ
@@ -398,24 +923,30 @@ class ChessBoardGUI:
             # Обрезаем текст, если он слишком длинный
             max_chars = SCREEN_WIDTH // 12
             display_text = self.last_ai_response[:max_chars]
-            text_surface = font.render(display_text, True, (200, 200, 200))
+            text_surface = self.render_text(display_text, AI_RESPONSE_COLOR)
             SCREEN.blit(text_surface, (BOARD_OFFSET_X, info_y + 60))
         
         # Управление
         controls = [
             "N - Новая игра",
-            "ESC - Выход"
+            "ESC - Выход",
+            "Shift+клик - превращение в коня",
+            "Стрелки, Home/End - ходы, S - сохранить PGN"
         ]
+        if self.archive is not None:
+            controls[2] = "[ ] - другая партия из файла"
         
-        control_x = BOARD_OFFSET_X + BOARD_SIZE - 200
+        # Выравниваем подсказки по правому краю доски
         for i, control_text in enumerate(controls):
-            text_surface = font.render(control_text, True, (255, 255, 255))
+            text_surface = self.render_text(control_text, TEXT_COLOR)
+            control_x = BOARD_OFFSET_X + BOARD_SIZE - text_surface.get_width()
             SCREEN.blit(text_surface, (control_x, info_y + i * 30))
 
     def handle_event(self, event):
         """Обработка событий Pygame"""
         if event.type == pygame.MOUSEBUTTONDOWN:
-            if self.is_player_turn and not self.thinking and not self.animation_in_progress:
+            # Ходить можно только в текущей позиции, не при просмотре
+            if self.is_player_turn and not self.thinking and self.view_ply is None:
                 pos = pygame.mouse.get_pos()
                 square = self.pixel_to_square(pos)
                 
@@ -424,72 +955,129 @@ class ChessBoardGUI:
                         # Выбрана фигура
                         piece = self.board.piece_at(square)
                         if piece and piece.color == self.board.turn:
-                            self.selected_square = square
-                            self.possible_moves_highlight = [
-                                move.to_square for move in self.board.legal_moves 
-                                if move.from_square == self.selected_square
-                            ]
+                            self.set_selection(square)
                     else:
-                        # Сделан ход
-                        move = chess.Move(self.selected_square, square)
-                        if move in self.board.legal_moves:
-                            self.animate_move(move)
-                            self.board.push(move)
-                            self.move_history.append(move.uci())
-                            self.selected_square = None
-                            self.possible_moves_highlight = []
+                        # Сделан ход (при превращении пешки - в ферзя, с Shift - в коня)
+                        promotion = chess.KNIGHT if pygame.key.get_mods() & pygame.KMOD_SHIFT else chess.QUEEN
+                        move = self.move_history.legal_index().find(self.selected_square, square, promotion)
+                        if move is not None:
+                            self.set_selection(None)
+                            self.push_move(move)
                             self.is_player_turn = False
                         else:
                             # Попытка выбрать другую фигуру или отменить выбор
                             piece = self.board.piece_at(square)
                             if piece and piece.color == self.board.turn:
-                                self.selected_square = square
-                                self.possible_moves_highlight = [
-                                    move.to_square for move in self.board.legal_moves 
-                                    if move.from_square == self.selected_square
-                                ]
+                                self.set_selection(square)
                             else:
-                                self.selected_square = None
-                                self.possible_moves_highlight = []
+                                self.set_selection(None)
         
         elif event.type == pygame.KEYDOWN:
             if event.key == pygame.K_n:
-                self.board = chess.Board()
-                self.llm_ai = LLMAI()
-                self.selected_square = None
-                self.is_player_turn = True
-                self.move_history = []
-                self.thinking = False
-                self.last_ai_response = ""
-                self.possible_moves_highlight = []
-                self.current_animation = None
-                self.animation_in_progress = False
-                self.last_move_squares = None
+                self.new_game()
+            elif event.key in VIEW_KEYS:
+                self.step_view(VIEW_KEYS[event.key])
+            elif event.key == pygame.K_HOME:
+                self.set_view(0)
+            elif event.key == pygame.K_END:
+                self.set_view(len(self.record))
+            elif event.key in (pygame.K_LEFTBRACKET, pygame.K_RIGHTBRACKET) and self.archive is not None:
+                delta = 1 if event.key == pygame.K_RIGHTBRACKET else -1
+                self.show_archive_game(self.archive_index + delta)
+            elif event.key == pygame.K_s:
+                self.save_game()
             elif event.key == pygame.K_ESCAPE:
+                self.shutdown()
                 pygame.quit()
                 sys.exit()
+        
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            self.mark_dirty()
+
+    def shutdown(self):
+        """Отмена запросов, сохранение партии, закрытие кэша ответов LLM и HTTP соединений"""
+        self.cancel_ai_move()
+        # Незаконченная партия и состояние просмотра - для продолжения при следующем запуске
+        if self.record and not self.game_over:
+            self.autosave()
+        self.autosaver.close()
+        if self.ponderer is not None:
+            self.ponderer.shutdown()
+        self.ai.close()
+        self.ai_factory.close()
+        stats = self.llm_cache.stats()
+        print(f"Кэш LLM: попаданий {stats['hits']}, промахов {stats['misses']}")
+        self.llm_cache.close()
+        close_clients()
+        if self.metrics.enabled:
+            self.metrics.write_prometheus(os.path.splitext(METRICS_PATH)[0] + ".prom")
+            self.metrics.close()
+
+    def is_idle(self):
+        """Нет анимации, запроса к LLM и перерисовки - можно ждать событий"""
+        return (not self.animations and self.pending_ai_move is None and
+                not self.full_redraw and not self.dirty_rects and
+                (self.is_player_turn or self.game_over))
+
+    def render(self):
+        """Перерисовка только измененных областей экрана"""
+        if self.render_square_size != SQUARE_SIZE:
+            self.build_render_cache()
+        
+        self.advance_animations(self.frame_dt)
+        
+        full_redraw = self.full_redraw
+        if full_redraw:
+            rects = [SCREEN.get_rect()]
+        elif self.dirty_rects:
+            rects = self.dirty_rects
+        else:
+            return
+        # Области, помеченные во время отрисовки, попадут в следующий кадр
+        self.full_redraw = False
+        self.dirty_rects = []
+        
+        # Рисуем только внутри измененной области
+        SCREEN.set_clip(rects[0].unionall(rects[1:]))
+        SCREEN.fill(BACKGROUND_COLOR)
+        self.draw_board()
+        self.draw_pieces()
+        self.draw_animation()
+        self.draw_info()
+        SCREEN.set_clip(None)
+        
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
 
     def run(self):
         """Основной игровой цикл"""
         running = True
         while running:
-            for event in pygame.event.get():
+            if self.is_idle():
+                # В простое ждем события вместо отрисовки 60 кадров в секунду
+                events = [pygame.event.wait(IDLE_EVENT_TIMEOUT)] + pygame.event.get()
+            else:
+                events = pygame.event.get()
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
                 self.handle_event(event)
 
-            SCREEN.fill(BACKGROUND_COLOR)
-            self.draw_board()
-            self.draw_pieces()
-            self.draw_animation()
-            self.draw_info()
-            pygame.display.flip()
+            self.render()
 
-            if not self.is_player_turn and not self.animation_in_progress and not self.board.is_game_over():
-                self.get_ai_move()
+            # Игровая логика не ждет анимацию: запрос хода уходит сразу
+            if not self.is_player_turn and not self.game_over:
+                if self.pending_ai_move is None:
+                    self.get_ai_move()
+                else:
+                    self.poll_ai_move()
 
-            self.clock.tick(60)  # Ограничение FPS
+            # Ограничение FPS; время кадра продвигает анимации
+            self.frame_dt = self.clock.tick(FPS)
 
+        self.shutdown()
         pygame.quit()
         sys.exit()
 
@@ -501,7 +1089,7 @@ if __name__ == "__main__":
     print("Игра запущена! Вы играете белыми против LLM ИИ.")
     print("Используйте мышь для ходов.")
     print("Управление: N - новая игра, ESC - выход")
-    game_gui = ChessBoardGUI()
+    game_gui = ChessBoardGUI(sys.argv[1] if len(sys.argv) > 1 else None)
     game_gui.run()
 
 
@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+
+
+class NullMetrics:
+    """Отключенные метрики: все методы ничего не делают"""
+    enabled = False
+
+    def incr(self, name, value=1):
+        pass
+
+    def observe(self, name, value):
+        pass
+
+    def record(self, event, **fields):
+        pass
+
+    def timer(self, name):
+        return _NULL_TIMER
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+NULL_METRICS = NullMetrics()
+
+
+class _Timer:
+    """Замер времени блока кода (в секундах)"""
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+        self.metrics.observe(self.name, self.elapsed)
+        return False
+
+
+class Metrics:
+    """Счетчики, распределения и поток событий для запросов к LLM
+
+    Счетчики (incr) и наблюдения (observe) агрегируются в памяти и выгружаются
+    в текстовом формате Prometheus. События (record) пишутся построчно в JSONL.
+    """
+    enabled = True
+
+    def __init__(self, jsonl_path=None):
+        self.jsonl_path = jsonl_path
+        self.counters = {}
+        self.summaries = {}  # имя -> [количество, сумма, минимум, максимум]
+        self._lock = threading.Lock()
+        self._jsonl = None
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+            self._jsonl = open(jsonl_path, "a", encoding="utf-8")
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self._lock:
+            summary = self.summaries.get(name)
+            if summary is None:
+                self.summaries[name] = [1, value, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = min(summary[2], value)
+                summary[3] = max(summary[3], value)
+
+    def record(self, event, **fields):
+        """Запись события в JSONL (если задан файл)"""
+        if self._jsonl is None:
+            return
+        fields["event"] = event
+        fields["ts"] = time.time()
+        line = json.dumps(fields, ensure_ascii=False)
+        with self._lock:
+            self._jsonl.write(line + "\n")
+            self._jsonl.flush()
+
+    def timer(self, name):
+        return _Timer(self, name)
+
+    def snapshot(self):
+        """Текущие значения счетчиков и распределений"""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "summaries": {
+                    name: {"count": count, "sum": total, "min": low, "max": high}
+                    for name, (count, total, low, high) in self.summaries.items()
+                },
+            }
+
+    def prometheus_text(self):
+        """Выгрузка в текстовом формате Prometheus"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = _prometheus_name(name)
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}_total {value}")
+        for name, summary in sorted(snapshot["summaries"].items()):
+            metric = _prometheus_name(name)
+            lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_count {summary['count']}")
+            lines.append(f"{metric}_sum {summary['sum']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+    def close(self):
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+
+
+def _prometheus_name(name):
+    return "chessllm_" + "".join(ch if ch.isalnum() else "_" for ch in name)
@@ -0,0 +1,67 @@
+import re
+
+# Кандидат в ход: UCI (e2e4, e2-e4, e7e8q) или SAN (Nf3, exd5, e8=Q+, O-O-O).
+# Ход не должен быть частью слова; дефис и "=" тоже продолжают ход (O-O-O, e8=Q)
+_MOVE_RE = re.compile(
+    r"(?<![A-Za-z0-9])"
+    r"(?:(?P<uci>[a-h][1-8]-?[a-h][1-8][qrbnQRBN]?)"
+    r"|(?P<san>(?:O-O-O|O-O|0-0-0|0-0|[KQRBN]?[a-h]?[1-8]?x?[a-h][1-8](?:=?[QRBN])?)[+#]?))"
+    r"(?![A-Za-z0-9=\-])"
+)
+
+
+class MoveExtractor:
+    """Поиск легального хода в тексте ответа LLM, в том числе по частям (stream)
+
+    Терпит лишний текст вокруг хода ("Move: e2e4", "Ход: Nf3."). Ход принимается,
+    как только он однозначно определен: UCI код без вариантов превращения можно
+    принять сразу, SAN - только когда после него пришел разделитель.
+    """
+    def __init__(self, legal_index):
+        self.legal_index = legal_index
+        self.text = ""
+        self._pos = 0  # Начало еще не разобранной части текста
+
+    @classmethod
+    def parse(cls, text, legal_index):
+        """Разбор полного ответа: легальный ход или None"""
+        extractor = cls(legal_index)
+        return extractor.feed(text) or extractor.finish()
+
+    def feed(self, chunk):
+        """Добавить фрагмент ответа; вернуть ход, если он уже определен"""
+        self.text += chunk
+        return self._scan(final=False)
+
+    def finish(self):
+        """Конец ответа: ход в конце текста тоже считается законченным"""
+        return self._scan(final=True)
+
+    def _scan(self, final):
+        for match in _MOVE_RE.finditer(self.text, self._pos):
+            at_end = match.end() == len(self.text)
+            if at_end and not final:
+                # Ход может продолжиться в следующем фрагменте
+                move = self._unique_uci_prefix(match)
+                if move is not None:
+                    self._pos = len(self.text)
+                return move
+            move = self._resolve(match)
+            self._pos = match.end()
+            if move is not None:
+                return move
+        return None
+
+    def _unique_uci_prefix(self, match):
+        """UCI код, который уже нельзя дополнить до другого хода"""
+        token = match.group("uci")
+        if token is None:
+            return None
+        # Ход без буквы фигуры превращения не найдется, если превращение обязательно
+        return self._resolve(match)
+
+    def _resolve(self, match):
+        token = match.group("uci")
+        if token is not None:
+            return self.legal_index.get_uci(token.replace("-", "").lower())
+        return self.legal_index.get_san(match.group("san"))
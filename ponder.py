@@ -0,0 +1,154 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+import chess.engine
+import chess.polyglot
+
+PONDER_TOP_K = 3  # Сколько вероятных ходов игрока обдумывать заранее
+PONDER_CONCURRENCY = 2  # Одновременных фоновых запросов к LLM
+PONDER_BUDGET = 40  # Максимум фоновых запросов за партию (экономия квоты)
+PONDER_CACHE_SIZE = 16  # Сколько заранее запрошенных позиций хранить
+ENGINE_PONDER_TIME = 0.05  # Время движка на ранжирование ходов игрока
+
+PIECE_VALUES = {
+    chess.PAWN: 1,
+    chess.KNIGHT: 3,
+    chess.BISHOP: 3,
+    chess.ROOK: 5,
+    chess.QUEEN: 9,
+    chess.KING: 0,
+}
+CENTER_SQUARES = {chess.D4, chess.E4, chess.D5, chess.E5}
+
+
+def rank_candidates(board, top_k, engine=None):
+    """Наиболее вероятные ходы стороны, которая ходит (движок или эвристика)"""
+    if engine is not None:
+        infos = engine.analyse(board, chess.engine.Limit(time=ENGINE_PONDER_TIME), multipv=top_k)
+        return [info["pv"][0] for info in infos if info.get("pv")]
+    return sorted(board.legal_moves, key=lambda move: _heuristic_score(board, move), reverse=True)[:top_k]
+
+
+def _heuristic_score(board, move):
+    """Дешевая оценка хода: взятия (MVV-LVA), шахи, превращения, центр, развитие"""
+    score = 0
+    piece = board.piece_at(move.from_square)
+    if board.is_capture(move):
+        victim = board.piece_at(move.to_square)
+        victim_value = PIECE_VALUES[victim.piece_type] if victim else PIECE_VALUES[chess.PAWN]
+        score += 10 * victim_value - PIECE_VALUES[piece.piece_type]
+    if move.promotion:
+        score += 8
+    if board.is_castling(move):
+        score += 3
+    if board.gives_check(move):
+        score += 5
+    if move.to_square in CENTER_SQUARES:
+        score += 1
+    if piece.piece_type in (chess.KNIGHT, chess.BISHOP) and chess.square_rank(move.from_square) in (0, 7):
+        score += 1
+    return score
+
+
+class Ponderer:
+    """Фоновые запросы к LLM для вероятных ответов игрока, пока он думает
+
+    Ходы запрашиваются у источника ходов (см. providers.py). Результаты
+    (Future с chess.Move) хранятся в ограниченном кэше по позиции.
+    Перед настоящим запросом GUI забирает готовый или еще выполняющийся ответ;
+    если он не дал хода, GUI запрашивает ход обычным образом. У каждого запроса
+    свое событие отмены: отмена снимает запросы из очереди, а уже отправленные
+    прерывает (потоковый ответ закрывается на следующем фрагменте).
+    """
+    def __init__(self, provider, top_k=PONDER_TOP_K, concurrency=PONDER_CONCURRENCY,
+                 budget=PONDER_BUDGET, cache_size=PONDER_CACHE_SIZE, engine=None):
+        self.provider = provider
+        self.top_k = top_k
+        self.budget = budget
+        self.cache_size = cache_size
+        self.engine = engine
+        self.requests_made = 0
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()  # Ключ позиции -> (Future, событие отмены)
+        self._taken = None  # Событие отмены ответа, отданного GUI
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ponder")
+
+    def start(self, board):
+        """Запуск фоновых запросов для ответов игрока в текущей позиции"""
+        if board.is_game_over() or self.requests_made >= self.budget:
+            return
+        for move in rank_candidates(board, self.top_k, self.engine):
+            next_board = board.copy()
+            next_board.push(move)
+            if next_board.is_game_over():
+                continue
+            key = chess.polyglot.zobrist_hash(next_board)
+            with self._lock:
+                if key in self._results or self.requests_made >= self.budget:
+                    continue
+                self.requests_made += 1
+                cancel = threading.Event()
+                future = self._pool.submit(self.provider.get_move, next_board, None, cancel)
+                self._results[key] = (future, cancel)
+                self._evict()
+
+    def take(self, board):
+        """Заранее запрошенный ответ для позиции (Future) или None"""
+        key = chess.polyglot.zobrist_hash(board)
+        with self._lock:
+            future, cancel = self._results.pop(key, (None, None))
+            # Ответы для других ходов игрока больше не нужны
+            self._cancel_all()
+            self._taken = cancel
+        # Отмененный, упавший или пустой фоновый запрос - промах, ход запрашивается заново
+        if future is not None and future.done() and not self.usable(future):
+            future = None
+        if future is None:
+            self.misses += 1
+        return future
+
+    @staticmethod
+    def usable(future):
+        """Завершенный фоновый запрос дал ход"""
+        return not future.cancelled() and future.exception() is None and future.result() is not None
+
+    def settle(self, hit):
+        """Итог ответа, взятого через take(): попадание засчитывается, только если он дал ход"""
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def cancel(self):
+        """Отмена всех фоновых запросов, включая отданный GUI (новая партия, выход)"""
+        with self._lock:
+            self._cancel_all()
+            if self._taken is not None:
+                self._taken.set()
+                self._taken = None
+
+    def reset(self, provider):
+        """Новая партия: сброс бюджета и переход на новый источник ходов"""
+        self.cancel()
+        self.provider = provider
+        self.requests_made = 0
+
+    def shutdown(self):
+        self.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _cancel_all(self):
+        for future, cancel in self._results.values():
+            future.cancel()
+            cancel.set()
+        self._results.clear()
+
+    def _evict(self):
+        while len(self._results) > self.cache_size:
+            _, (future, cancel) = self._results.popitem(last=False)
+            future.cancel()
+            cancel.set()
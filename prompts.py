@@ -0,0 +1,137 @@
+"""Стратегии построения промпта для LLMAI
+
+Полный промпт (FullPrompt) повторяет исходный формат: FEN, вся история и
+все легальные ходы. Компактные стратегии выносят все неизменные инструкции
+в общий системный префикс (его провайдеры могут кэшировать между запросами),
+а в пользовательском сообщении оставляют только данные позиции.
+"""
+import chess
+
+STATIC_SYSTEM_PROMPT = """Ты шахматный гроссмейстер. Тебе присылают позицию, ты выбираешь лучший ход.
+Формат позиции: FEN, иногда последние ходы партии в SAN и список легальных ходов.
+В списке, сгруппированном по фигурам, запись "Ng1: f3 h3" означает ходы g1f3 и g1h3,
+а превращение пешки записывается буквой фигуры после клетки (e8q).
+Отвечай ТОЛЬКО UCI кодом хода (например: e2e4, g1f3, e7e8q), без пояснений."""
+
+
+class PromptStrategy:
+    """Базовая стратегия: name и version входят в ключ кэша ответов"""
+    name = "base"
+    version = 1
+    # Сколько последних ходов истории нужно: None - вся история, 0 - не нужна
+    history_window = None
+
+    @property
+    def cache_tag(self):
+        return f"{self.name}-v{self.version}"
+
+    def build(self, board, pgn_history, legal_index):
+        """Сообщения для chat.completions"""
+        raise NotImplementedError
+
+
+class FullPrompt(PromptStrategy):
+    """Исходный промпт: FEN, вся история и все легальные ходы"""
+    name = "full"
+    version = 2
+
+    def build(self, board, pgn_history, legal_index):
+        prompt = f"""Ты играешь в шахматы как {'белые' if board.turn == chess.WHITE else 'черные'}.
+
+Текущая позиция (FEN): {board.fen()}
+История ходов: {pgn_history or "Начальная позиция"}
+Ход номер: {board.fullmove_number}
+
+Доступные ходы в UCI формате: {legal_index.uci_str()}
+
+Выбери ЛУЧШИЙ ход из доступных и верни ТОЛЬКО UCI код хода (например: e2e4, g1f3, e7e8q).
+Не добавляй никаких объяснений, анализа или дополнительного текста.
+Ответ должен содержать только UCI код хода."""
+
+        return [
+            {
+                "role": "system",
+                "content": "Ты шахматный гроссмейстер. Твоя задача - выбрать лучший ход из предложенных вариантов и вернуть только UCI код этого хода."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+
+
+class FenPrompt(PromptStrategy):
+    """Только FEN: минимум токенов, модель сама находит легальные ходы"""
+    name = "fen"
+    history_window = 0
+
+    def build(self, board, pgn_history, legal_index):
+        return _static_messages(f"FEN: {board.fen()}")
+
+
+class WindowPrompt(PromptStrategy):
+    """FEN, последние несколько ходов и легальные ходы в UCI"""
+    name = "window"
+
+    def __init__(self, window=8):
+        self.history_window = window
+
+    @property
+    def cache_tag(self):
+        return f"{self.name}{self.history_window}-v{self.version}"
+
+    def build(self, board, pgn_history, legal_index):
+        lines = [f"FEN: {board.fen()}"]
+        if pgn_history:
+            lines.append(f"Последние ходы: {pgn_history}")
+        lines.append(f"Ходы: {legal_index.uci_str()}")
+        return _static_messages("\n".join(lines))
+
+
+class GroupedPrompt(PromptStrategy):
+    """FEN и легальные ходы, сгруппированные по фигурам (без повтора клетки откуда)"""
+    name = "grouped"
+    history_window = 0
+
+    def build(self, board, pgn_history, legal_index):
+        return _static_messages(f"FEN: {board.fen()}\nХоды: {grouped_moves(board, legal_index)}")
+
+
+def grouped_moves(board, legal_index):
+    """Строка вида "Ng1: f3 h3; Pe7: e8q e8r e8b e8n" """
+    groups = []
+    for from_square, targets in legal_index.targets.items():
+        piece = board.piece_at(from_square)
+        destinations = []
+        for to_square, moves in targets.items():
+            for move in moves:
+                promotion = chess.piece_symbol(move.promotion) if move.promotion else ""
+                destinations.append(chess.square_name(to_square) + promotion)
+        groups.append(f"{piece.symbol().upper()}{chess.square_name(from_square)}: {' '.join(destinations)}")
+    return "; ".join(groups)
+
+
+def _static_messages(position_text):
+    # Системное сообщение одинаково во всех запросах - общий префикс для кэша провайдера
+    return [
+        {"role": "system", "content": STATIC_SYSTEM_PROMPT},
+        {"role": "user", "content": position_text},
+    ]
+
+
+PROMPT_STRATEGIES = {
+    "full": FullPrompt,
+    "fen": FenPrompt,
+    "window": WindowPrompt,
+    "grouped": GroupedPrompt,
+}
+
+
+def get_prompt(name):
+    """Стратегия промпта по имени (full, fen, window, window<N>, grouped)"""
+    if name.startswith("window") and name[len("window"):].isdigit():
+        return WindowPrompt(int(name[len("window"):]))
+    try:
+        return PROMPT_STRATEGIES[name]()
+    except KeyError:
+        raise ValueError(f"Неизвестная стратегия промпта: {name}") from None
@@ -0,0 +1,284 @@
+"""Источники ходов для компьютерного игрока
+
+Каждый источник реализует get_move(board, legal_index=None, cancel=None) -> chess.Move
+или None. None означает "нет хода" (нет позиции в книге, LLM ответил недопустимым
+ходом), и тогда составной источник или вызывающий код переходит к следующему
+варианту. cancel - threading.Event: когда он установлен, ответ больше не нужен и
+долгие (сетевые) запросы прерываются.
+
+Источники задаются строкой:
+    random                      случайный легальный ход
+    llm:<модель>                LLM через OpenRouter (LLMAI)
+    uci:<путь к движку>         локальный UCI движок (процесс общий для всех партий)
+    book:<файл .bin>            дебютная книга в формате Polyglot
+    book:<файл>,llm:<модель>,uci:<движок>
+                                по очереди; последний источник - запасной и
+                                вызывается без ограничения по времени
+"""
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import chess
+import chess.engine
+import chess.polyglot
+
+from metrics import NULL_METRICS
+
+ENGINE_MOVE_TIME = 0.05  # Время на ход локального движка в секундах
+COMPOSITE_BUDGET = 10.0  # Сколько секунд составной источник ждет медленные источники
+LOCAL_TIMEOUT = 5.0  # Таймаут ожидания хода от локальных источников
+
+
+class MoveProvider:
+    """Базовый источник ходов"""
+    name = "provider"
+    local = True  # Локальные источники отвечают быстро и без сети
+    timeout = LOCAL_TIMEOUT  # Сколько GUI ждет ход, прежде чем сходить случайно
+    workers = 1  # Потоков для request_move
+    last_source = None  # Имя источника последнего хода (у составного источника)
+    _executor = None
+
+    def get_move(self, board, legal_index=None, cancel=None):
+        """Ход для позиции или None"""
+        raise NotImplementedError
+
+    def request_move(self, board, legal_index=None):
+        """Асинхронный запрос хода: Future с chess.Move или None"""
+        # Передаем копию доски, чтобы игровой цикл мог менять свою
+        return self._submit(self.get_move, board.copy(), legal_index)
+
+    def abort(self):
+        """Прервать запросы request_move, результат которых больше не нужен"""
+
+    def _submit(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name.split(":")[0])
+        return self._executor.submit(fn, *args)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class RandomProvider(MoveProvider):
+    """Случайный легальный ход"""
+    name = "random"
+
+    def get_move(self, board, legal_index=None, cancel=None):
+        if legal_index is not None:
+            return legal_index.random_move()
+        moves = list(board.legal_moves)
+        return random.choice(moves) if moves else None
+
+
+class LLMProvider(MoveProvider):
+    """Ход от LLM (свой экземпляр LLMAI на каждую партию - у него своя история)
+
+    Ожидание хода покрывает все повторы клиента. Брошенный запрос прерывается
+    через abort(), а второй поток не дает ему задержать следующий ход.
+    """
+    local = False
+    workers = 2
+
+    def __init__(self, llm_ai):
+        self.llm_ai = llm_ai
+        self.name = f"llm:{llm_ai.model_name}"
+        self.timeout = llm_ai.deadline
+        self._cancels = set()  # События отмены выполняющихся request_move
+        self._lock = threading.Lock()
+
+    def get_move(self, board, legal_index=None, cancel=None):
+        move_uci = self.llm_ai.get_llm_move(board, legal_index, cancel)
+        return chess.Move.from_uci(move_uci) if move_uci else None
+
+    def request_move(self, board, legal_index=None):
+        cancel = threading.Event()
+        with self._lock:
+            self._cancels.add(cancel)
+        future = self._submit(self.get_move, board.copy(), legal_index, cancel)
+        future.add_done_callback(lambda _: self._discard(cancel))
+        return future
+
+    def abort(self):
+        with self._lock:
+            for cancel in self._cancels:
+                cancel.set()
+            self._cancels.clear()
+
+    def _discard(self, cancel):
+        with self._lock:
+            self._cancels.discard(cancel)
+
+    def close(self):
+        self.abort()
+        super().close()
+        self.llm_ai.shutdown()
+
+
+class SharedEngine:
+    """UCI движок в отдельном процессе, запускается один раз и общий для всех партий"""
+    def __init__(self, path):
+        self.path = path
+        self._engine = None
+        self._lock = threading.Lock()
+
+    def play(self, board, limit):
+        with self._lock:
+            if self._engine is None:
+                self._engine = chess.engine.SimpleEngine.popen_uci(self.path)
+            return self._engine.play(board, limit).move
+
+    def close(self):
+        with self._lock:
+            if self._engine is not None:
+                self._engine.quit()
+                self._engine = None
+
+
+class EngineProvider(MoveProvider):
+    """Ход локального UCI движка"""
+    def __init__(self, engine, name, move_time=ENGINE_MOVE_TIME):
+        self.engine = engine  # SharedEngine
+        self.name = name
+        self.limit = chess.engine.Limit(time=move_time)
+
+    def get_move(self, board, legal_index=None, cancel=None):
+        return self.engine.play(board, self.limit)
+
+
+class BookProvider(MoveProvider):
+    """Ход из дебютной книги Polyglot (случайный с учетом весов) или None"""
+    def __init__(self, reader, name):
+        self.reader = reader  # chess.polyglot.MemoryMappedReader, общий для всех партий
+        self.name = name
+
+    def get_move(self, board, legal_index=None, cancel=None):
+        try:
+            return self.reader.weighted_choice(board).move
+        except IndexError:
+            return None
+
+
+class CompositeProvider(MoveProvider):
+    """Несколько источников по очереди с общим бюджетом времени на ход
+
+    Локальные источники (книга, движок, random) вызываются напрямую. Медленные
+    (LLM) работают в отдельном потоке и ждутся не дольше оставшегося бюджета;
+    опоздавший запрос прерывается. Запасной источник вызывается всегда, если
+    никто до него не дал ход.
+    """
+    def __init__(self, providers, fallback, budget=COMPOSITE_BUDGET, metrics=NULL_METRICS):
+        self.providers = providers
+        self.fallback = fallback
+        self.budget = budget
+        self.metrics = metrics
+        self.name = ",".join(provider.name for provider in providers + [fallback])
+        self.local = all(provider.local for provider in providers) and fallback.local
+        self.timeout = budget + fallback.timeout
+        self.sources = Counter()  # Сколько ходов дал каждый источник
+        self._pool = None
+        if not all(provider.local for provider in providers):
+            self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="composite")
+
+    def get_move(self, board, legal_index=None, cancel=None):
+        deadline = time.monotonic() + self.budget
+        for provider in self.providers:
+            if cancel is not None and cancel.is_set():
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.metrics.incr("provider.budget_exceeded")
+                break
+            move = self._ask(provider, board, legal_index, remaining)
+            if move is not None and board.is_legal(move):
+                return self._served(provider, move)
+        return self._served(self.fallback, self.fallback.get_move(board, legal_index))
+
+    def _ask(self, provider, board, legal_index, remaining):
+        if provider.local:
+            return provider.get_move(board, legal_index)
+        # Опоздавший запрос прерывается, иначе он занимает поток пула и следующие ходы ждут в очереди
+        cancel = threading.Event()
+        future = self._pool.submit(provider.get_move, board.copy(), legal_index, cancel)
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            future.cancel()
+            cancel.set()
+            self.metrics.incr("provider.timeouts")
+            return None
+
+    def _served(self, provider, move):
+        if move is not None:
+            self.last_source = provider.name
+            self.sources[provider.name] += 1
+            self.metrics.incr(f"provider.moves.{provider.name.split(':')[0]}")
+        return move
+
+    def close(self):
+        super().close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        for provider in self.providers + [self.fallback]:
+            provider.close()
+
+
+class ProviderFactory:
+    """Создание источников ходов по строке (см. описание модуля)
+
+    Тяжелые ресурсы (процесс движка, файл книги) создаются один раз и
+    переиспользуются всеми партиями; LLMAI создается заново на каждую партию
+    через llm_factory(model_name).
+    """
+    def __init__(self, spec, move_time=ENGINE_MOVE_TIME, llm_factory=None,
+                 budget=COMPOSITE_BUDGET, metrics=NULL_METRICS):
+        self.spec = spec
+        self.move_time = move_time
+        self.llm_factory = llm_factory
+        self.budget = budget
+        self.metrics = metrics
+        self.parts = [part.partition(":")[::2] for part in spec.split(",")]
+        self._engines = {}
+        self._books = {}
+        self._lock = threading.Lock()
+        for kind, arg in self.parts:
+            if kind not in ("random", "llm", "uci", "book"):
+                raise ValueError(f"Неизвестный тип игрока: {spec}")
+            if kind != "random" and not arg:
+                raise ValueError(f"Не указан параметр игрока: {spec}")
+            if kind == "llm" and llm_factory is None:
+                raise ValueError("Для LLM игрока нужна llm_factory")
+
+    def create(self):
+        providers = [self._create_one(kind, arg) for kind, arg in self.parts]
+        if len(providers) == 1:
+            return providers[0]
+        return CompositeProvider(providers[:-1], providers[-1], self.budget, self.metrics)
+
+    def _create_one(self, kind, arg):
+        if kind == "random":
+            return RandomProvider()
+        if kind == "llm":
+            return LLMProvider(self.llm_factory(arg))
+        with self._lock:
+            if kind == "uci":
+                engine = self._engines.get(arg)
+                if engine is None:
+                    engine = self._engines[arg] = SharedEngine(arg)
+                return EngineProvider(engine, f"uci:{arg}", self.move_time)
+            reader = self._books.get(arg)
+            if reader is None:
+                reader = self._books[arg] = chess.polyglot.open_reader(arg)
+            return BookProvider(reader, f"book:{arg}")
+
+    def close(self):
+        with self._lock:
+            for engine in self._engines.values():
+                engine.close()
+            for reader in self._books.values():
+                reader.close()
+            self._engines.clear()
+            self._books.clear()
@@ -0,0 +1,66 @@
+import threading
+import time
+
+RATE_LIMIT_PENALTY = 10.0  # Пауза в секундах для ключа после ответа 429
+
+
+class TokenBucket:
+    """Ведро токенов: rate запросов в секунду, не больше burst подряд"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Дождаться токена; вернуть время ожидания в секундах"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def penalize(self, seconds):
+        """Не выдавать токены seconds секунд (сервер ответил 429)"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class RateLimiter:
+    """Глобальное ограничение запросов в минуту по ключу (модель, API ключ)
+
+    Одно ведро на ключ общее для всех потоков и партий, поэтому число
+    одновременных партий можно поднимать, не превышая лимиты провайдера.
+    """
+    def __init__(self, requests_per_minute, burst=None, overrides=None):
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self.overrides = overrides or {}  # модель -> запросов в минуту
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, model, api_key=None):
+        return self._bucket(model, api_key).acquire()
+
+    def penalize(self, model, api_key=None, seconds=RATE_LIMIT_PENALTY):
+        self._bucket(model, api_key).penalize(seconds)
+
+    def _bucket(self, model, api_key):
+        key = (model, api_key)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                per_minute = self.overrides.get(model, self.requests_per_minute)
+                burst = self.burst or max(1, per_minute // 10)
+                bucket = self._buckets[key] = TokenBucket(per_minute / 60.0, burst)
+            return bucket
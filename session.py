@@ -0,0 +1,258 @@
+"""Сохранение и продолжение партий в компактном двоичном формате
+
+Формат записи (все числа little-endian):
+    заголовок   4s B B B B H H H H  магия b"CHSS", версия, результат, флаги,
+                                    резерв, полуходов, записей журнала ИИ,
+                                    просматриваемый полуход (0xFFFF - текущая
+                                    позиция), длина блока текста
+    ходы        H * полуходов       from | to << 6 | превращение << 12
+    текст       UTF-8               FEN начала (пусто - стандартная позиция),
+                                    заголовки партии, последний ответ ИИ
+    журнал ИИ   (H I B H + UTF-8)*  полуход, время ответа в мс, тип, текст
+
+Архив партий - файл из записей, каждой предшествует ее длина (I), поэтому
+заголовки тысяч партий читаются без разбора ходов.
+
+    python session.py sessions.chs
+"""
+import os
+import struct
+import sys
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+
+MAGIC = b"CHSS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBBBHHHH")
+LOG_ENTRY = struct.Struct("<HIBH")
+LENGTH = struct.Struct("<I")
+LIVE_VIEW = 0xFFFF  # Просматривается текущая позиция
+
+RESULT_CODES = {"*": 0, "1-0": 1, "0-1": 2, "1/2-1/2": 3}
+RESULTS = {code: result for result, code in RESULT_CODES.items()}
+
+LOG_MOVE = 0  # Ход ИИ
+LOG_FALLBACK = 1  # Случайный ход вместо ответа ИИ
+
+
+class Session:
+    """Состояние партии: начальная позиция, ходы, журнал ответов ИИ и состояние интерфейса"""
+    def __init__(self, moves=(), start_fen=None, headers=None, ai_log=None, view_ply=None,
+                 last_ai_response="", result="*"):
+        self.moves = list(moves)
+        self.start_fen = start_fen  # None - стандартная начальная позиция
+        self.headers = dict(headers or {})
+        self.ai_log = list(ai_log or [])  # [(полуход, время ответа в мс, тип, текст)]
+        self.view_ply = view_ply
+        self.last_ai_response = last_ai_response
+        self.result = result
+
+    def board(self):
+        """Доска с историей ходов"""
+        board = chess.Board(self.start_fen) if self.start_fen else chess.Board()
+        for move in self.moves:
+            board.push(move)
+        return board
+
+
+def pack_move(move):
+    promotion = move.promotion - 1 if move.promotion else 0
+    return move.from_square | move.to_square << 6 | promotion << 12
+
+
+def unpack_move(code):
+    promotion = code >> 12
+    return chess.Move(code & 0x3F, code >> 6 & 0x3F, promotion + 1 if promotion else None)
+
+
+def encode_session(session):
+    """Запись сессии в байты"""
+    moves = array("H", (pack_move(move) for move in session.moves))
+    if sys.byteorder != "little":
+        moves.byteswap()
+    header_lines = "\n".join(f"{name}\t{value}" for name, value in session.headers.items())
+    text = "\0".join((session.start_fen or "", header_lines, session.last_ai_response)).encode("utf-8")
+    view_ply = LIVE_VIEW if session.view_ply is None else session.view_ply
+
+    parts = [
+        HEADER.pack(MAGIC, FORMAT_VERSION, RESULT_CODES.get(session.result, 0), 0, 0,
+                    len(session.moves), len(session.ai_log), view_ply, len(text)),
+        moves.tobytes(),
+        text,
+    ]
+    for ply, think_ms, kind, message in session.ai_log:
+        data = message.encode("utf-8")
+        parts.append(LOG_ENTRY.pack(ply, min(think_ms, 0xFFFFFFFF), kind, len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def read_header(data):
+    """Заголовок записи: (результат, полуходов) без разбора остального"""
+    magic, version, result, _, _, plies, _, _, _ = HEADER.unpack_from(data)
+    _check_header(magic, version)
+    return RESULTS.get(result, "*"), plies
+
+
+def decode_session(data):
+    """Сессия из байтов"""
+    magic, version, result, _, _, plies, log_count, view_ply, text_length = HEADER.unpack_from(data)
+    _check_header(magic, version)
+    offset = HEADER.size
+    moves = array("H")
+    moves.frombytes(data[offset:offset + plies * 2])
+    if sys.byteorder != "little":
+        moves.byteswap()
+    offset += plies * 2
+    start_fen, header_lines, last_ai_response = data[offset:offset + text_length].decode("utf-8").split("\0")
+    offset += text_length
+
+    ai_log = []
+    for _ in range(log_count):
+        ply, think_ms, kind, length = LOG_ENTRY.unpack_from(data, offset)
+        offset += LOG_ENTRY.size
+        ai_log.append((ply, think_ms, kind, data[offset:offset + length].decode("utf-8")))
+        offset += length
+
+    headers = dict(line.split("\t", 1) for line in header_lines.split("\n") if line)
+    return Session(
+        moves=[unpack_move(code) for code in moves],
+        start_fen=start_fen or None,
+        headers=headers,
+        ai_log=ai_log,
+        view_ply=None if view_ply == LIVE_VIEW else view_ply,
+        last_ai_response=last_ai_response,
+        result=RESULTS.get(result, "*"),
+    )
+
+
+def _check_header(magic, version):
+    if magic != MAGIC:
+        raise ValueError("Это не файл сохранения партии")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия сохранения: {version}")
+
+
+def save_session(path, session):
+    """Атомарная запись сессии в файл (через временный файл)"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode_session(session))
+    os.replace(tmp_path, path)
+
+
+def load_session(path):
+    """Сессия из файла или None, если файла нет или он поврежден"""
+    try:
+        with open(path, "rb") as f:
+            return decode_session(f.read())
+    except FileNotFoundError:
+        return None
+    except (ValueError, struct.error, UnicodeDecodeError) as e:
+        print(f"Не удалось прочитать сохранение {path}: {e}")
+        return None
+
+
+class SessionArchive:
+    """Архив партий: записи с длиной, дописываются в конец файла"""
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, session):
+        data = encode_session(session)
+        with open(self.path, "ab") as f:
+            f.write(LENGTH.pack(len(data)) + data)
+
+    def scan(self):
+        """(смещение, результат, полуходов) всех партий - читаются только заголовки"""
+        entries = []
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, "rb") as f:
+            while True:
+                offset = f.tell()
+                prefix = f.read(LENGTH.size + HEADER.size)
+                if len(prefix) < LENGTH.size + HEADER.size:
+                    break
+                (length,) = LENGTH.unpack_from(prefix)
+                result, plies = read_header(prefix[LENGTH.size:])
+                entries.append((offset, result, plies))
+                f.seek(offset + LENGTH.size + length)
+        return entries
+
+    def load(self, offset):
+        """Партия по смещению из scan()"""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            (length,) = LENGTH.unpack(f.read(LENGTH.size))
+            return decode_session(f.read(length))
+
+
+class Autosaver:
+    """Фоновое автосохранение: запись файла не задерживает кадр
+
+    Сессия сериализуется в вызывающем потоке (это микросекунды), а запись на
+    диск выполняет отдельный поток. Если за время записи пришло несколько
+    сохранений, записывается только последнее.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._pending = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autosave")
+
+    def save(self, session):
+        data = encode_session(session)
+        with self._lock:
+            scheduled = self._pending is not None
+            self._pending = data
+        if not scheduled:
+            self._executor.submit(self._write)
+
+    def clear(self):
+        """Удалить автосохранение (после уже поставленных записей)"""
+        with self._lock:
+            self._pending = None
+        self._executor.submit(self._remove)
+
+    def close(self):
+        """Дождаться записи на диск"""
+        self._executor.shutdown(wait=True)
+
+    def _write(self):
+        with self._lock:
+            data, self._pending = self._pending, None
+        if data is None:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Ошибка автосохранения: {e}")
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Использование: python session.py <архив партий>")
+        return
+    entries = SessionArchive(sys.argv[1]).scan()
+    results = {}
+    for _, result, _ in entries:
+        results[result] = results.get(result, 0) + 1
+    plies = sum(entry[2] for entry in entries)
+    print(f"Партий: {len(entries)}, полуходов: {plies}, результаты: {results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+import pygame
+
+ATLAS_CACHE_SIZES = 4  # Сколько размеров клетки держать отмасштабированными
+
+# Файл изображения для символа фигуры python-chess
+PIECE_FILES = {
+    "P": "wP", "N": "wN", "B": "wB", "R": "wR", "Q": "wQ", "K": "wK",
+    "p": "bP", "n": "bN", "b": "bB", "r": "bR", "q": "bQ", "k": "bK",
+}
+
+
+class SpriteAtlas:
+    """Изображения фигур в формате дисплея, отмасштабированные под размер клетки
+
+    PNG читаются с диска один раз при первом обращении (когда окно уже создано,
+    иначе convert_alpha невозможен). Для каждого размера клетки все 12 фигур
+    сглаженно масштабируются в один лист, а фигуры - его подповерхности.
+    Листы нескольких последних размеров кэшируются, поэтому смена размера окна
+    не требует повторной загрузки и масштабирования.
+    """
+    def __init__(self, assets_path, cache_sizes=ATLAS_CACHE_SIZES):
+        self.assets_path = assets_path
+        self.cache_sizes = cache_sizes
+        self._originals = None
+        self._sheets = OrderedDict()  # размер клетки -> (лист, {символ: подповерхность})
+
+    def load(self):
+        """Загрузка исходных изображений (вызывается автоматически)"""
+        if self._originals is None:
+            self._originals = {
+                symbol: pygame.image.load(f"{self.assets_path}/{name}.png").convert_alpha()
+                for symbol, name in PIECE_FILES.items()
+            }
+        return self._originals
+
+    def sprites(self, size):
+        """Словарь {символ фигуры: Surface size x size}"""
+        entry = self._sheets.get(size)
+        if entry is None:
+            entry = self._sheets[size] = self._build_sheet(size)
+            while len(self._sheets) > self.cache_sizes:
+                self._sheets.popitem(last=False)
+        else:
+            self._sheets.move_to_end(size)
+        return entry[1]
+
+    def _build_sheet(self, size):
+        originals = self.load()
+        sheet = pygame.Surface((size * len(originals), size), pygame.SRCALPHA).convert_alpha()
+        sheet.fill((0, 0, 0, 0))
+        sprites = {}
+        for index, (symbol, image) in enumerate(originals.items()):
+            scaled = pygame.transform.smoothscale(image, (size, size))
+            # Сложение с прозрачным листом копирует пиксели вместе с альфа-каналом
+            sheet.blit(scaled, (index * size, 0), special_flags=pygame.BLEND_RGBA_ADD)
+            sprites[symbol] = sheet.subsurface((index * size, 0, size, size))
+        return sheet, sprites
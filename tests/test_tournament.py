@@ -0,0 +1,97 @@
+"""Турнир против локальной заглушки API: расписание, продолжение и таблица"""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+import pytest
+
+from llm_client import get_client
+from prompts import get_prompt
+from rate_limit import RateLimiter
+from stub_server import StubConfig, start_stub_server
+from tournament import ELO_BASE, build_schedule, compute_elo, run_tournament, standings
+
+PLAYERS = ["llm:a", "llm:b", "random"]
+
+
+@pytest.fixture(scope="module")
+def stub():
+    config = StubConfig(illegal_rate=0.2, seed=1)
+    server, base_url = start_stub_server(config)
+    yield config, base_url
+    server.shutdown()
+    server.server_close()
+
+
+def play(stub, out_dir):
+    config, base_url = stub
+    llm_options = {"client": get_client(base_url), "prompt": get_prompt("fen"),
+                   "rate_limiter": RateLimiter(6000), "stream": False}
+    requests_before = config.requests
+    table = run_tournament(PLAYERS, str(out_dir), games_per_pair=2, concurrency=3, max_plies=12,
+                           llm_options=llm_options)
+    return table, config.requests - requests_before
+
+
+def read_stats(out_dir):
+    with open(os.path.join(out_dir, "stats.jsonl"), encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_schedule():
+    schedule = build_schedule(PLAYERS, "round-robin", 2)
+    assert [game_id for game_id, _, _ in schedule] == [1, 2, 3, 4, 5, 6]
+    # Во втором круге пары те же, цвета поменялись
+    assert [(b, w) for _, w, b in schedule[3:]] == [(w, b) for _, w, b in schedule[:3]]
+    assert build_schedule(PLAYERS, "gauntlet", 1) == [(1, "llm:a", "llm:b"), (2, "llm:a", "random")]
+    with pytest.raises(ValueError):
+        build_schedule(PLAYERS, "swiss")
+
+
+def test_tournament_and_resume(stub, tmp_path):
+    table, requests = play(stub, tmp_path)
+    stats = read_stats(tmp_path)
+    assert sorted(entry["game_id"] for entry in stats) == [1, 2, 3, 4, 5, 6]
+    assert requests > 0
+    assert sum(entry["games"] for _, entry in table) == 12
+    assert sum(entry["score"] for _, entry in table) == 6.0
+
+    # Все партии сыграны: повторный запуск не отправляет запросов
+    table_again, requests = play(stub, tmp_path)
+    assert requests == 0
+    assert table_again == table
+
+    # Прерванный турнир: две последние партии не записаны и доигрываются
+    with open(tmp_path / "stats.jsonl", "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in stats[:4])
+    play(stub, tmp_path)
+    resumed = read_stats(tmp_path)
+    assert len(resumed) == 6
+    assert sorted(entry["game_id"] for entry in resumed) == [1, 2, 3, 4, 5, 6]
+    assert [entry["game_id"] for entry in resumed[:4]] == [entry["game_id"] for entry in stats[:4]]
+
+
+def test_standings_and_elo():
+    def game(game_id, white, black, result):
+        return {"game_id": game_id, "white": white, "black": black, "result": result,
+                "fallbacks_white": 0, "fallbacks_black": 1}
+
+    results = {1: game(1, "a", "b", "1-0"), 2: game(2, "b", "a", "0-1"),
+               3: game(3, "a", "c", "1-0"), 4: game(4, "b", "c", "1/2-1/2"),
+               5: game(5, "c", "b", "*")}
+    table = dict(standings(results, ["a", "b", "c"]))
+    assert table["a"]["wins"] == 3 and table["a"]["score"] == 3.0
+    assert table["b"]["draws"] == 2 and table["c"]["draws"] == 2
+    # Случайный ход в каждой партии у черных
+    assert [table[name]["fallbacks"] for name in "abc"] == [1, 2, 2]
+    # c набрал то же очко, что и b, но за меньшее число партий
+    assert table["a"]["elo"] > table["c"]["elo"] > table["b"]["elo"]
+    assert abs(sum(entry["elo"] for entry in table.values()) / 3 - ELO_BASE) <= 1
+
+    # Равные результаты - равные рейтинги
+    even = compute_elo({"x": {"score": 1.0}, "y": {"score": 1.0}}, {("x", "y"): 2})
+    assert abs(even["x"] - even["y"]) < 1e-6
+    assert abs(even["x"] - ELO_BASE) < 1e-6
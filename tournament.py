@@ -0,0 +1,265 @@
+"""Турнир между моделями (и другими источниками ходов) без pygame-окна
+
+Расписание - круговой турнир или гонтлет (первый игрок против всех).
+Партии играются параллельно, запросы к LLM ограничиваются общим лимитом
+на модель и API ключ. Состояние хранится в папке турнира: прерванный турнир
+продолжается той же командой, сыгранные партии не повторяются.
+
+    python tournament.py --players llm:openai/gpt-4o-mini llm:meta-llama/llama-3.3-70b-instruct random \\
+        --games-per-pair 10 --concurrency 16 --rpm 60 --out tournament
+    python benchmarks/stub_server.py --latency 0.1 &
+    python tournament.py --base-url http://127.0.0.1:8000/v1 --players llm:a llm:b llm:c --rpm 600
+"""
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from headless import add_score, empty_score, play_game, MAX_PLIES
+from llm_cache import MoveCache
+from llm_client import get_client, close_clients, MAX_CONNECTIONS
+from main import LLMAI
+from metrics import Metrics, NULL_METRICS
+from prompts import get_prompt
+from providers import ProviderFactory, ENGINE_MOVE_TIME, COMPOSITE_BUDGET
+from rate_limit import RateLimiter
+
+STATE_VERSION = 1
+DEFAULT_RPM = 60  # Запросов в минуту на модель по умолчанию
+ELO_BASE = 1500  # Средний рейтинг участников
+ELO_ITERATIONS = 200
+
+
+def build_schedule(players, mode="round-robin", games_per_pair=2):
+    """Список партий [(номер, белые, черные)]; цвета чередуются по кругам"""
+    if mode == "round-robin":
+        pairs = [(a, b) for i, a in enumerate(players) for b in players[i + 1:]]
+    elif mode == "gauntlet":
+        pairs = [(players[0], b) for b in players[1:]]
+    else:
+        raise ValueError(f"Неизвестное расписание: {mode}")
+    schedule = []
+    # Круги идут друг за другом, чтобы в каждый момент играли разные пары (и модели)
+    for round_index in range(games_per_pair):
+        for a, b in pairs:
+            white, black = (a, b) if round_index % 2 == 0 else (b, a)
+            schedule.append((len(schedule) + 1, white, black))
+    return schedule
+
+
+class TournamentState:
+    """Состояние турнира на диске: параметры, PGN и результаты сыгранных партий"""
+    def __init__(self, out_dir, config):
+        self.out_dir = out_dir
+        self.config_path = os.path.join(out_dir, "tournament.json")
+        self.pgn_path = os.path.join(out_dir, "games.pgn")
+        self.stats_path = os.path.join(out_dir, "stats.jsonl")
+        os.makedirs(out_dir, exist_ok=True)
+
+        if os.path.exists(self.config_path):
+            with open(self.config_path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved != config:
+                raise ValueError(f"В папке {out_dir} уже другой турнир (другие игроки или расписание)")
+        else:
+            with open(self.config_path, "w", encoding="utf-8") as f:
+                json.dump(config, f, ensure_ascii=False, indent=2)
+
+        self.results = self._load_results()
+        self._pgn_file = open(self.pgn_path, "a", encoding="utf-8")
+        self._stats_file = open(self.stats_path, "a", encoding="utf-8")
+
+    def _load_results(self):
+        results = {}
+        if not os.path.exists(self.stats_path):
+            return results
+        with open(self.stats_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    stats = json.loads(line)
+                except ValueError:
+                    continue  # Строка, недописанная при аварийной остановке
+                results[stats["game_id"]] = stats
+        return results
+
+    def save(self, game, stats):
+        """Дописать партию: сначала PGN, затем результат (по нему турнир продолжается)"""
+        print(game, file=self._pgn_file, end="\n\n")
+        self._pgn_file.flush()
+        self._stats_file.write(json.dumps(stats, ensure_ascii=False) + "\n")
+        self._stats_file.flush()
+        self.results[stats["game_id"]] = stats
+
+    def close(self):
+        self._pgn_file.close()
+        self._stats_file.close()
+
+
+def standings(results, players):
+    """Таблица: очки, победы/ничьи/поражения, случайные ходы и рейтинг Эло"""
+    table = {name: empty_score() for name in players}
+    pair_games = {}
+    for stats in results.values():
+        add_score(table, stats)
+        pair = tuple(sorted((stats["white"], stats["black"])))
+        pair_games[pair] = pair_games.get(pair, 0) + 1
+
+    for name, elo in compute_elo(table, pair_games).items():
+        table[name]["elo"] = round(elo)
+    return sorted(table.items(), key=lambda item: (-item[1]["elo"], -item[1]["score"]))
+
+
+def compute_elo(table, pair_games):
+    """Рейтинг по модели Брэдли-Терри (итерации MM, ничья - половина победы)
+
+    Каждому игроку добавляется одна виртуальная ничья с игроком силы 1,
+    чтобы рейтинг оставался конечным при 100% или 0% очков.
+    """
+    strength = {name: 1.0 for name in table}
+    for _ in range(ELO_ITERATIONS):
+        updated = {}
+        for name, entry in table.items():
+            denominator = 1.0 / (strength[name] + 1.0)
+            for (a, b), games in pair_games.items():
+                if name in (a, b):
+                    other = b if name == a else a
+                    denominator += games / (strength[name] + strength[other])
+            updated[name] = (entry["score"] + 0.5) / denominator
+        strength = updated
+    elos = {name: 400.0 * math.log10(value) for name, value in strength.items()}
+    shift = ELO_BASE - sum(elos.values()) / len(elos) if elos else 0.0
+    return {name: elo + shift for name, elo in elos.items()}
+
+
+def run_tournament(players, out_dir, mode="round-robin", games_per_pair=2, concurrency=8,
+                   max_plies=MAX_PLIES, move_time=ENGINE_MOVE_TIME, budget=COMPOSITE_BUDGET,
+                   llm_options=None, metrics=NULL_METRICS):
+    """Сыграть недостающие партии турнира и вернуть таблицу результатов"""
+    schedule = build_schedule(players, mode, games_per_pair)
+    config = {"version": STATE_VERSION, "players": players, "mode": mode,
+              "games_per_pair": games_per_pair, "max_plies": max_plies}
+    state = TournamentState(out_dir, config)
+    pending = [game for game in schedule if game[0] not in state.results]
+    if len(pending) < len(schedule):
+        print(f"Продолжаем турнир: сыграно {len(schedule) - len(pending)} из {len(schedule)} партий")
+
+    # Параметры LLMAI (client, cache, samples, quorum, metrics, stream, prompt, rate_limiter)
+    llm_options = llm_options or {}
+
+    def llm_factory(model_name):
+        return LLMAI(model_name, **llm_options)
+
+    factories = {spec: ProviderFactory(spec, move_time, llm_factory, budget, metrics) for spec in players}
+
+    def run_one(game_id, white_spec, black_spec):
+        white, black = factories[white_spec].create(), factories[black_spec].create()
+        # В таблице игроки называются так, как заданы в командной строке
+        white.name, black.name = white_spec, black_spec
+        try:
+            return play_game(game_id, white, black, max_plies, metrics)
+        finally:
+            white.close()
+            black.close()
+
+    started = time.perf_counter()
+    played = 0
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="game") as pool:
+            futures = [pool.submit(run_one, *game) for game in pending]
+            for future in as_completed(futures):
+                game, stats = future.result()
+                game.headers["Event"] = "LLM tournament"
+                state.save(game, stats)
+                played += 1
+                print(f"[{len(state.results)}/{len(schedule)}] Партия {stats['game_id']}: "
+                      f"{stats['white']} - {stats['black']} {stats['result']} ({stats['termination']})")
+    finally:
+        state.close()
+        for factory in factories.values():
+            factory.close()
+
+    elapsed = time.perf_counter() - started
+    if played:
+        print(f"Сыграно {played} партий за {elapsed:.1f} с ({played / elapsed * 60:.1f} партий в минуту)")
+    table = standings(state.results, players)
+    with open(os.path.join(out_dir, "standings.json"), "w", encoding="utf-8") as f:
+        json.dump([dict(entry, player=name) for name, entry in table], f, ensure_ascii=False, indent=2)
+    return table
+
+
+def print_standings(table):
+    print("=== ТАБЛИЦА ===")
+    print(f"{'#':>2} {'Игрок':<45} {'Эло':>5} {'Очки':>6} {'Партий':>6} {'+':>4} {'=':>4} {'-':>4} {'Случ.':>6}")
+    for place, (name, entry) in enumerate(table, 1):
+        print(f"{place:>2} {name:<45} {entry['elo']:>5} {entry['score']:>6.1f} {entry['games']:>6} "
+              f"{entry['wins']:>4} {entry['draws']:>4} {entry['losses']:>4} {entry['fallbacks']:>6}")
+
+
+def parse_rpm_overrides(values):
+    """Значения вида модель=запросов_в_минуту"""
+    overrides = {}
+    for value in values:
+        model, _, rpm = value.rpartition("=")
+        if not model:
+            raise ValueError(f"Ожидается модель=число: {value}")
+        overrides[model] = int(rpm)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Турнир LLM моделей с параллельными партиями")
+    parser.add_argument("--players", nargs="+", required=True,
+                        help="Участники: llm:<модель>, uci:<движок>, book:<книга>, random или их комбинации")
+    parser.add_argument("--mode", choices=("round-robin", "gauntlet"), default="round-robin",
+                        help="Круговой турнир или первый игрок против всех")
+    parser.add_argument("--games-per-pair", type=int, default=2, help="Партий в каждой паре (цвета чередуются)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Партий одновременно")
+    parser.add_argument("--out", default="results/tournament", help="Папка турнира (для продолжения)")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES, help="Максимум полуходов в партии")
+    parser.add_argument("--move-time", type=float, default=ENGINE_MOVE_TIME,
+                        help="Время на ход UCI движка в секундах")
+    parser.add_argument("--budget", type=float, default=COMPOSITE_BUDGET,
+                        help="Бюджет времени на ход для составного игрока в секундах")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_RPM, help="Запросов в минуту на модель и ключ")
+    parser.add_argument("--rpm-model", action="append", default=[],
+                        help="Свой лимит для модели: модель=запросов_в_минуту (можно несколько)")
+    parser.add_argument("--burst", type=int, default=None, help="Запросов подряд без ожидания")
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI-совместимый API (по умолчанию OpenRouter, можно локальную заглушку)")
+    parser.add_argument("--cache", default=None, help="Файл SQLite для кэша ответов LLM")
+    parser.add_argument("--prompt", default="full",
+                        help="Стратегия промпта: full, fen, window, window<N>, grouped")
+    parser.add_argument("--no-stream", action="store_true", help="Ждать полный ответ LLM вместо потокового")
+    parser.add_argument("--metrics", default=None,
+                        help="JSONL файл метрик (рядом сохраняется .prom в формате Prometheus)")
+    args = parser.parse_args()
+
+    if len(set(args.players)) != len(args.players) or len(args.players) < 2:
+        parser.error("Нужно минимум два разных участника")
+
+    cache = MoveCache(args.cache) if args.cache else None
+    client = get_client(args.base_url, max_connections=max(MAX_CONNECTIONS, args.concurrency * 2))
+    metrics = Metrics(args.metrics) if args.metrics else NULL_METRICS
+    limiter = RateLimiter(args.rpm, args.burst, parse_rpm_overrides(args.rpm_model))
+    llm_options = {"client": client, "cache": cache, "metrics": metrics, "stream": not args.no_stream,
+                   "prompt": get_prompt(args.prompt), "rate_limiter": limiter}
+    try:
+        table = run_tournament(args.players, args.out, args.mode, args.games_per_pair, args.concurrency,
+                               args.max_plies, args.move_time, args.budget, llm_options, metrics)
+    finally:
+        if cache is not None:
+            cache.close()
+        close_clients()
+        if metrics.enabled:
+            metrics.write_prometheus(os.path.splitext(args.metrics)[0] + ".prom")
+            metrics.close()
+
+    print_standings(table)
+
+
+if __name__ == "__main__":
+    main()